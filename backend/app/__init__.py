@@ -5,7 +5,9 @@ from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
 from flask_jwt_extended import JWTManager
 from flask_cors import CORS
+from werkzeug.middleware.proxy_fix import ProxyFix
 from dotenv import load_dotenv
+from app.db_config import engine_options, pool_metrics
 
 load_dotenv()
 
@@ -23,6 +25,8 @@ def create_app():
         database_url = database_url.replace('postgres://', 'postgresql://', 1)
     app.config['SQLALCHEMY_DATABASE_URI'] = database_url
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    # Pool sizing, pre-ping, recycle, statement_timeout — see app/db_config.py
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(database_url)
 
     # JWT — use a stable secret from env; fallback for local dev only
     jwt_secret = os.getenv('JWT_SECRET_KEY')
@@ -31,12 +35,76 @@ def create_app():
         jwt_secret = 'dev-insecure-fallback-key'
     app.config['JWT_SECRET_KEY'] = jwt_secret
     app.config['JWT_ACCESS_TOKEN_EXPIRES'] = timedelta(hours=24)
+    # Revocation check reads each user's token_version from memory for this long
+    app.config['USER_CACHE_TTL_SECONDS'] = int(os.getenv('USER_CACHE_TTL_SECONDS', '60'))
+
+    # PIN hashing: werkzeug method + optional server-side pepper (see app/pins.py).
+    # Existing hashes are upgraded to these settings on the next login. The
+    # cheap method is only safe with a pepper; without one keep werkzeug's scrypt.
+    app.config['PIN_PEPPER'] = os.getenv('PIN_PEPPER')
+    app.config['PIN_HASH_METHOD'] = os.getenv(
+        'PIN_HASH_METHOD', 'pbkdf2:sha256:5000' if app.config['PIN_PEPPER'] else 'scrypt')
+    if not app.config['PIN_PEPPER'] and os.getenv('APP_ENV') == 'production':
+        print("⚠ WARNING: PIN_PEPPER not set! PINs use slow scrypt hashes; set it for fast logins.")
+
+    # Unpaid (CREATED) orders give their stock back after this many minutes
+    app.config['UNPAID_ORDER_TTL_MINUTES'] = int(os.getenv('UNPAID_ORDER_TTL_MINUTES', '15'))
+
+    # Pickup slots: bucket length, default orders per bucket the kitchen can
+    # hand out (Location.slot_capacity overrides), and how many buckets later
+    # a checkout may be moved when its own bucket is full
+    app.config['SLOT_MINUTES'] = int(os.getenv('SLOT_MINUTES', '15'))
+    app.config['SLOT_KITCHEN_CAPACITY'] = int(os.getenv('SLOT_KITCHEN_CAPACITY', '30'))
+    app.config['SLOT_MAX_SHIFT'] = int(os.getenv('SLOT_MAX_SHIFT', '2'))
+
+    # Kitchen queue order (app/kitchen.py): prep time of dishes without one,
+    # how far waiting pulls an order forward (0..1), minutes gained per bump
+    app.config['KITCHEN_DEFAULT_PREP_MINUTES'] = int(os.getenv('KITCHEN_DEFAULT_PREP_MINUTES', '10'))
+    app.config['KITCHEN_AGING'] = float(os.getenv('KITCHEN_AGING', '0.25'))
+    app.config['KITCHEN_BUMP_MINUTES'] = int(os.getenv('KITCHEN_BUMP_MINUTES', '10'))
+
+    # Which free locker cell a READY order gets: nearest, round_robin, size_aware
+    app.config['LOCKER_POLICY'] = os.getenv('LOCKER_POLICY', 'nearest')
+
+    # How long a READY order's QR token / PIN can be used at the kiosk
+    app.config['PICKUP_TOKEN_TTL_MINUTES'] = int(os.getenv('PICKUP_TOKEN_TTL_MINUTES', '720'))
+    # Shared with locker kiosks so they can verify QR tokens offline; unset = off
+    app.config['KIOSK_SIGNING_KEY'] = os.getenv('KIOSK_SIGNING_KEY')
+
+    # How long a stored Idempotency-Key response can be replayed
+    app.config['IDEMPOTENCY_TTL_HOURS'] = int(os.getenv('IDEMPOTENCY_TTL_HOURS', '24'))
+
+    # Background sweep of expired locker holds / unpaid orders; 0 = off (use cron)
+    app.config['SWEEPER_INTERVAL_SECONDS'] = int(os.getenv('SWEEPER_INTERVAL_SECONDS', '0'))
+    app.config['SWEEPER_BATCH_SIZE'] = int(os.getenv('SWEEPER_BATCH_SIZE', '500'))
+
+    # Order events fan-out: 'memory' (single worker) or 'postgres' (LISTEN/NOTIFY)
+    app.config['EVENTS_BACKEND'] = os.getenv('EVENTS_BACKEND', 'memory')
+    # Open SSE streams per worker; each holds a thread (Procfile: --threads 16)
+    app.config['STREAM_MAX_PER_WORKER'] = int(os.getenv('STREAM_MAX_PER_WORKER', '4'))
+
+    # GET /menu payload cache; writes invalidate, TTL only catches out-of-band edits
+    app.config['MENU_CACHE_TTL_SECONDS'] = int(os.getenv('MENU_CACHE_TTL_SECONDS', '60'))
+    # Precompressed menu snapshots (default: instance/menu_snapshots)
+    app.config['MENU_SNAPSHOT_DIR'] = os.getenv('MENU_SNAPSHOT_DIR')
+    app.config['MENU_SNAPSHOT_MAX_AGE_HOURS'] = int(os.getenv('MENU_SNAPSHOT_MAX_AGE_HOURS', '24'))
     
     # Extensions
     db.init_app(app)
     migrate.init_app(app, db)
     jwt.init_app(app)
     
+    from app.events import bus
+    from app.menu_cache import menu_cache
+    from app.menu_snapshots import menu_snapshots
+    from app.sweeper import sweeper
+    from app.current_user import token_versions
+    bus.init_app(app)
+    menu_snapshots.init_app(app)
+    menu_cache.init_app(app)
+    token_versions.init_app(app)
+    sweeper.init_app(app)
+    
     # CORS — allow Vercel frontend, localhost, and any FRONTEND_URL
     frontend_url = os.getenv('FRONTEND_URL', '')
     allowed_origins = [
@@ -51,6 +119,13 @@ def create_app():
 
     CORS(app, resources={r"/api/*": {"origins": allowed_origins}},
          supports_credentials=True)
+
+    # Proxies in front of the app (1 behind the hosting router). request.remote_addr
+    # is then the address the nearest of them saw; X-Forwarded-For entries the
+    # client added itself are ignored. 0 = clients connect directly.
+    proxy_hops = int(os.getenv('PROXY_HOPS', '1' if os.getenv('APP_ENV') == 'production' else '0'))
+    if proxy_hops:
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=proxy_hops, x_proto=proxy_hops)
     
     # Import models for migrations
     from app import models  # noqa
@@ -60,14 +135,24 @@ def create_app():
     def health():
         return jsonify({"status": "ok"}), 200
     
+    # Connection pool saturation and checkout latency
+    @app.route('/api/health/db')
+    def health_db():
+        return jsonify(pool_metrics.snapshot(db.engine.pool)), 200
+    
     # Register blueprints
     from app.routes import auth, menu, orders, cook, pickup
-    from app.routes import admin
+    from app.routes import admin, stream
     app.register_blueprint(auth.bp, url_prefix='/api/auth')
     app.register_blueprint(menu.bp, url_prefix='/api')
     app.register_blueprint(orders.bp, url_prefix='/api')
     app.register_blueprint(cook.bp, url_prefix='/api/cook')
     app.register_blueprint(pickup.bp, url_prefix='/api')
     app.register_blueprint(admin.bp, url_prefix='/api/admin')
+    app.register_blueprint(stream.bp, url_prefix='/api/stream')
+    
+    # CLI commands (flask <command>)
+    from app.commands import register_commands
+    register_commands(app)
     
     return app
@@ -0,0 +1,30 @@
+"""
+CLI commands - run with `flask --app app <command>`
+"""
+import click
+from app.schema import setup_database
+from app.stock import expire_unpaid_orders
+from app.sweeper import sweep
+
+
+def register_commands(app):
+    @app.cli.command('setup-db')
+    def setup_db_command():
+        """Apply migrations and seed an empty database (run once per deploy)."""
+        setup_database(app)
+        click.echo("✓ Database is up to date")
+
+    @app.cli.command('expire-orders')
+    def expire_orders_command():
+        """Cancel unpaid orders past their TTL and return their stock."""
+        count = expire_unpaid_orders()
+        click.echo(f"✓ Expired {count} unpaid orders")
+
+    @app.cli.command('sweep')
+    @click.option('--batch-size', default=None, type=int, help='Rows per UPDATE batch.')
+    def sweep_command(batch_size):
+        """Flag expired locker holds, cancel unpaid orders, purge old idempotency keys (cron)."""
+        counts = sweep(batch_size=batch_size or app.config['SWEEPER_BATCH_SIZE'])
+        click.echo(f"✓ Flagged {counts['expired_holds']} expired locker holds, "
+                   f"expired {counts['expired_orders']} unpaid orders, "
+                   f"purged {counts['expired_keys']} idempotency keys")
@@ -0,0 +1,105 @@
+"""
+Current user from JWT claims - org_id, group_id and role ride in the token
+
+Access tokens carry everything a request needs to authorize (see
+user_claims), so routes read current_user() instead of loading the User.
+Tokens are revoked by bumping User.token_version on a role or PIN change,
+or by deleting the user: every request compares the token's `ver` claim
+with the user's current version, which comes from a small LRU cache with a
+TTL. A group change does not bump it, so the token keeps the old group_id
+until it expires or the user logs in again.
+Bumps go out on the event bus, so with EVENTS_BACKEND=postgres every worker
+drops its copy at once; the TTL is the bound otherwise.
+"""
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from flask import g
+from flask_jwt_extended import get_jwt, get_jwt_identity
+from app import db, jwt
+from app.events import bus
+from app.models import User
+
+CHANNEL = 'cache:users'
+MAX_ENTRIES = 10000
+
+CurrentUser = namedtuple('CurrentUser', 'id org_id group_id role')
+
+
+def user_claims(user):
+    """additional_claims for `user`'s access token."""
+    return {
+        'role': user.role,
+        'display_name': user.display_name,
+        'org_id': user.org_id,
+        'group_id': user.group_id,
+        'lang': user.language,
+        'ver': user.token_version or 0,
+    }
+
+
+def current_user():
+    """The authenticated user as a CurrentUser, built once per request from the token."""
+    if 'current_user' not in g:
+        claims = get_jwt()
+        if 'org_id' in claims:
+            g.current_user = CurrentUser(get_jwt_identity(), claims['org_id'],
+                                         claims.get('group_id'), claims.get('role'))
+        else:
+            # Token issued before org_id was a claim
+            user = db.session.get(User, get_jwt_identity())
+            g.current_user = user and CurrentUser(user.id, user.org_id, user.group_id, user.role)
+    return g.current_user
+
+
+class TokenVersions:
+    """user_id -> token_version, LRU with a TTL."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # user_id -> (version, expires_at)
+        self.ttl = 60
+
+    def init_app(self, app):
+        self.ttl = app.config['USER_CACHE_TTL_SECONDS']
+        bus.on(CHANNEL, self._on_invalidate)
+        jwt.token_in_blocklist_loader(self._is_revoked)
+
+    def get(self, user_id):
+        """Current version of `user_id`'s tokens; None if the user is gone."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry and entry[1] > now:
+                self._entries.move_to_end(user_id)
+                return entry[0]
+
+        row = db.session.query(User.token_version).filter(User.id == user_id).first()
+        version = (row.token_version or 0) if row else None
+        with self._lock:
+            self._entries[user_id] = (version, now + self.ttl)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > MAX_ENTRIES:
+                self._entries.popitem(last=False)
+        return version
+
+    @staticmethod
+    def bump(user):
+        """Revoke `user`'s existing tokens; call invalidate() after the commit."""
+        user.token_version = (user.token_version or 0) + 1
+
+    def invalidate(self, user_id):
+        event = {'user_id': user_id}
+        self._on_invalidate(event)
+        bus.publish(CHANNEL, event)
+
+    def _on_invalidate(self, event):
+        with self._lock:
+            self._entries.pop(event.get('user_id'), None)
+
+    def _is_revoked(self, jwt_header, jwt_payload):
+        version = self.get(jwt_payload['sub'])
+        return version is None or jwt_payload.get('ver', 0) != version
+
+
+token_versions = TokenVersions()
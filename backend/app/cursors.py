@@ -0,0 +1,18 @@
+"""
+Keyset cursors - '<iso timestamp>|<id>' positions for paginated and
+incremental lists (kitchen queue, order history)
+
+A cursor is the sort key of the last row a client has seen; the next page
+filters on tuple_(timestamp column, id) against it, so no OFFSET scans.
+"""
+from datetime import datetime
+
+
+def encode_cursor(moment, row_id):
+    return f'{moment.isoformat()}|{row_id}'
+
+
+def parse_cursor(value):
+    """'<iso timestamp>|<id>' -> (datetime, id). Raises ValueError."""
+    moment, row_id = value.split('|', 1)
+    return datetime.fromisoformat(moment), row_id
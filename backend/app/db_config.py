@@ -0,0 +1,133 @@
+"""
+Database engine configuration - SQLALCHEMY_ENGINE_OPTIONS presets per environment
+
+APP_ENV picks a preset (development, production); any value can be
+overridden with DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT,
+DB_POOL_RECYCLE, DB_STATEMENT_TIMEOUT_MS. DB_PGBOUNCER=1 switches to
+PgBouncer transaction-mode compatibility: no client-side pool (PgBouncer
+pools), no pre-ping and no startup `options` (PgBouncer rejects them; set
+statement_timeout with ALTER ROLE instead). Migrations turn statement_timeout
+off on their own connection (migrations/env.py); run them against the
+database directly, not through PgBouncer.
+"""
+import os
+import threading
+import time
+from collections import deque
+from sqlalchemy.pool import QueuePool, NullPool
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+
+PRESETS = {
+    'development': {
+        'pool_size': 5,
+        'max_overflow': 5,
+        'pool_timeout': 10,
+        'pool_recycle': 1800,
+        'statement_timeout_ms': 0,
+    },
+    'production': {
+        'pool_size': 10,
+        'max_overflow': 10,
+        'pool_timeout': 5,
+        # Hosting proxies drop idle connections after a few minutes
+        'pool_recycle': 280,
+        'statement_timeout_ms': 5000,
+    },
+}
+
+ENV_OVERRIDES = {
+    'pool_size': 'DB_POOL_SIZE',
+    'max_overflow': 'DB_MAX_OVERFLOW',
+    'pool_timeout': 'DB_POOL_TIMEOUT',
+    'pool_recycle': 'DB_POOL_RECYCLE',
+    'statement_timeout_ms': 'DB_STATEMENT_TIMEOUT_MS',
+}
+
+
+class PoolMetrics:
+    """Checkout latency samples and timeouts, read by /api/health/db."""
+
+    def __init__(self, samples=1000):
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=samples)
+        self.checkouts = 0
+        self.timeouts = 0
+
+    def record(self, seconds):
+        with self._lock:
+            self._latencies.append(seconds)
+            self.checkouts += 1
+
+    def record_timeout(self):
+        with self._lock:
+            self.timeouts += 1
+
+    def snapshot(self, pool):
+        with self._lock:
+            latencies = sorted(self._latencies)
+        result = {
+            'checkouts': self.checkouts,
+            'timeouts': self.timeouts,
+            'checkout_ms': None,
+        }
+        if latencies:
+            result['checkout_ms'] = {
+                'p50': round(latencies[len(latencies) // 2] * 1000, 2),
+                'p95': round(latencies[int(len(latencies) * 0.95)] * 1000, 2),
+                'max': round(latencies[-1] * 1000, 2),
+            }
+        if isinstance(pool, QueuePool):
+            capacity = pool.size() + max(pool._max_overflow, 0)
+            result.update({
+                'pool_size': pool.size(),
+                'checked_out': pool.checkedout(),
+                'overflow': pool.overflow(),
+                'saturation': round(pool.checkedout() / capacity, 2) if capacity else None,
+            })
+        return result
+
+
+pool_metrics = PoolMetrics()
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that records how long each checkout waited for a connection."""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            conn = super()._do_get()
+        except PoolTimeoutError:
+            pool_metrics.record_timeout()
+            raise
+        pool_metrics.record(time.perf_counter() - started)
+        return conn
+
+
+def engine_options(database_url, env=None):
+    """SQLALCHEMY_ENGINE_OPTIONS for `database_url` under preset `env`."""
+    if not database_url or not database_url.startswith('postgresql'):
+        return {'pool_pre_ping': True}
+
+    env = env or os.getenv('APP_ENV', 'development')
+    settings = dict(PRESETS.get(env, PRESETS['development']))
+    for key, var in ENV_OVERRIDES.items():
+        if os.getenv(var):
+            settings[key] = int(os.getenv(var))
+
+    if os.getenv('DB_PGBOUNCER') == '1':
+        return {'poolclass': NullPool}
+
+    options = {
+        'poolclass': InstrumentedQueuePool,
+        'pool_size': settings['pool_size'],
+        'max_overflow': settings['max_overflow'],
+        'pool_timeout': settings['pool_timeout'],
+        'pool_recycle': settings['pool_recycle'],
+        'pool_pre_ping': True,
+    }
+    if settings['statement_timeout_ms']:
+        options['connect_args'] = {
+            'options': f"-c statement_timeout={settings['statement_timeout_ms']}"
+        }
+    return options
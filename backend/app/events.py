@@ -0,0 +1,178 @@
+"""
+Order events - pub/sub behind the SSE stream (/api/stream/orders)
+
+Channels: 'user:<user_id>' (the order's owner) and 'location:<location_id>'
+(cooks of that canteen). In-process callbacks can also listen on a channel,
+e.g. 'cache:menu' invalidations. Backends, chosen by EVENTS_BACKEND:
+  memory   — in-process fan-out, enough for a single gunicorn worker
+  postgres — publishes with pg_notify, every worker LISTENs and fans out
+             to its own subscribers, so any number of workers share events
+"""
+import json
+import os
+import queue
+import select
+import threading
+import time
+from sqlalchemy import text
+
+
+class Subscription:
+    def __init__(self, channels):
+        self.channels = set(channels)
+        self.queue = queue.Queue(maxsize=100)
+
+    def get(self, timeout):
+        """Next event, or None after `timeout` seconds of silence."""
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class MemoryBroker:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = {}  # channel -> set of Subscription
+        self._callbacks = {}  # channel -> list of callables
+
+    def subscribe(self, channels):
+        sub = Subscription(channels)
+        with self._lock:
+            for channel in sub.channels:
+                self._subscribers.setdefault(channel, set()).add(sub)
+        return sub
+
+    def unsubscribe(self, sub):
+        with self._lock:
+            for channel in sub.channels:
+                subs = self._subscribers.get(channel)
+                if subs:
+                    subs.discard(sub)
+                    if not subs:
+                        del self._subscribers[channel]
+
+    def listen(self, channel, callback):
+        with self._lock:
+            self._callbacks.setdefault(channel, []).append(callback)
+
+    def publish(self, channel, event):
+        self._dispatch(channel, event)
+
+    def _dispatch(self, channel, event):
+        with self._lock:
+            subs = list(self._subscribers.get(channel, ()))
+            callbacks = list(self._callbacks.get(channel, ()))
+        for callback in callbacks:
+            callback(event)
+        for sub in subs:
+            try:
+                sub.queue.put_nowait(event)
+            except queue.Full:
+                pass  # slow client; it resyncs over REST on reconnect
+
+
+class PostgresBroker(MemoryBroker):
+    PG_CHANNEL = 'order_events'
+
+    def __init__(self, engine, dsn):
+        super().__init__()
+        self._engine = engine
+        self._dsn = dsn
+        self._listener_pid = None
+
+    def _ensure_listener(self):
+        # One listener thread per process; restarted if we were forked
+        if self._listener_pid != os.getpid():
+            with self._lock:
+                if self._listener_pid != os.getpid():
+                    threading.Thread(target=self._listen, daemon=True).start()
+                    self._listener_pid = os.getpid()
+
+    def subscribe(self, channels):
+        self._ensure_listener()
+        return super().subscribe(channels)
+
+    def listen(self, channel, callback):
+        self._ensure_listener()
+        super().listen(channel, callback)
+
+    def publish(self, channel, event):
+        self._ensure_listener()
+        payload = json.dumps({'channel': channel, 'event': event})
+        with self._engine.begin() as conn:
+            conn.execute(text("SELECT pg_notify(:pg_channel, :payload)"),
+                         {'pg_channel': self.PG_CHANNEL, 'payload': payload})
+
+    def _listen(self):
+        import psycopg2
+
+        while True:
+            try:
+                conn = psycopg2.connect(self._dsn)
+                conn.autocommit = True
+                conn.cursor().execute(f'LISTEN {self.PG_CHANNEL}')
+                while True:
+                    if select.select([conn], [], [], 30) == ([], [], []):
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        message = json.loads(conn.notifies.pop(0).payload)
+                        self._dispatch(message['channel'], message['event'])
+            except Exception as e:
+                print(f"⚠ order events listener: {e}")
+                time.sleep(2)
+
+
+class EventBus:
+    """Flask extension wrapper; the broker is picked in init_app."""
+
+    def __init__(self):
+        self.broker = None
+
+    def init_app(self, app):
+        backend = app.config.get('EVENTS_BACKEND', 'memory')
+        if backend == 'postgres':
+            with app.app_context():
+                from app import db
+                engine = db.engine
+            # libpq wants a plain postgresql:// URL, without the +driver suffix
+            dsn = engine.url.set(drivername='postgresql').render_as_string(hide_password=False)
+            self.broker = PostgresBroker(engine, dsn)
+        else:
+            self.broker = MemoryBroker()
+
+    def subscribe(self, channels):
+        return self.broker.subscribe(channels)
+
+    def unsubscribe(self, sub):
+        self.broker.unsubscribe(sub)
+
+    def on(self, channel, callback):
+        """Call `callback(event)` in every worker for each event on `channel`."""
+        self.broker.listen(channel, callback)
+
+    def publish(self, channel, event):
+        try:
+            self.broker.publish(channel, event)
+        except Exception as e:
+            print(f"⚠ publish {channel}: {e}")
+
+    def publish_order(self, order, **extra):
+        """Push an order's status to its owner and to its location's cooks."""
+        event = {
+            'order_id': order.id,
+            'status': order.status,
+            'location_id': order.location_id,
+            'updated_at': order.updated_at.isoformat() if order.updated_at else None,
+        }
+        try:
+            # Cooks don't need the student's pickup code
+            self.broker.publish(f'location:{order.location_id}', event)
+            self.broker.publish(f'user:{order.user_id}', {**event, **extra})
+        except Exception as e:
+            # Never fail the request that already committed
+            print(f"⚠ publish order event: {e}")
+
+
+bus = EventBus()
@@ -0,0 +1,116 @@
+"""
+Idempotency keys - replay the first response to a retried request
+
+Clients that may retry (flaky mobile networks, double taps) send an
+Idempotency-Key header. A route claims the key first: the row is inserted
+(not yet committed) before any other work, so a duplicate sent while the
+first request is still running blocks on the unique index instead of
+redoing the work. The first successful response is filled in and committed
+with the change it reports; a failed request rolls back and frees the key.
+A retry gets the stored response back (Idempotent-Replayed: true) from this
+one table. Reusing a key for a different request is refused with 422.
+Keys live IDEMPOTENCY_TTL_HOURS and the sweeper deletes older ones.
+"""
+import hashlib
+import json
+from datetime import datetime, timedelta
+from flask import current_app, jsonify, request
+from sqlalchemy import delete, select
+from sqlalchemy.exc import IntegrityError
+from app import db
+from app.models import IdempotencyKey
+
+HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 255
+
+
+def request_key():
+    """The request's Idempotency-Key, or None. Raises ValueError if it is unusable."""
+    key = request.headers.get(HEADER)
+    if key is None:
+        return None
+    key = key.strip()
+    if not key or len(key) > MAX_KEY_LENGTH:
+        raise ValueError(key)
+    return key
+
+
+def request_hash():
+    # Same key, same endpoint, same JSON body (whitespace and key order don't matter)
+    body = json.dumps(request.get_json(silent=True), sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(f'{request.method} {request.path}\n{body}'.encode()).hexdigest()
+
+
+def _expires_before(now=None):
+    return (now or datetime.utcnow()) - timedelta(hours=current_app.config['IDEMPOTENCY_TTL_HOURS'])
+
+
+def stored_response(user_id, key):
+    """Replay of the response stored for `key`, a 422 if it was used for another request, else None."""
+    record = IdempotencyKey.query.filter_by(user_id=user_id, key=key).first()
+    if not record:
+        return None
+    if record.created_at < _expires_before():
+        # Expired but not swept yet: free the key, it goes with the caller's commit
+        db.session.delete(record)
+        db.session.flush()
+        return None
+    if record.request_hash != request_hash():
+        return jsonify({
+            'error': 'idempotency_key_reused',
+            'message': 'Idempotency-Key уже использован для другого запроса'
+        }), 422
+    response = jsonify(record.response_body)
+    response.status_code = record.status_code
+    response.headers['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def claim(user_id, key):
+    """
+    Reserve `key` for the current request, or answer it from the store.
+    Returns (record, None) to go ahead - fill the record with complete() -
+    or (None, response) for a replay / conflict.
+    """
+    replay = stored_response(user_id, key)
+    if replay:
+        return None, replay
+    # Placeholder values: never committed, complete() overwrites them
+    record = IdempotencyKey(user_id=user_id, key=key, request_hash=request_hash(),
+                            status_code=0, response_body={})
+    db.session.add(record)
+    try:
+        db.session.flush()
+    except IntegrityError:
+        # A duplicate got here first and has committed by now
+        db.session.rollback()
+        return None, stored_response(user_id, key) or (jsonify({
+            'error': 'idempotency_key_in_use',
+            'message': 'Запрос с этим Idempotency-Key ещё выполняется'
+        }), 409)
+    return record, None
+
+
+def complete(record, status_code, body):
+    """Store `body` as the key's response; the caller's commit saves it."""
+    if record is not None:
+        record.status_code = status_code
+        record.response_body = body
+
+
+def purge_expired(now=None, batch_size=500):
+    """Delete keys older than IDEMPOTENCY_TTL_HOURS in batches. Returns count."""
+    cutoff = _expires_before(now)
+    purged = 0
+    while True:
+        batch = select(IdempotencyKey.id).where(
+            IdempotencyKey.created_at < cutoff
+        ).limit(batch_size).scalar_subquery()
+        count = db.session.execute(
+            delete(IdempotencyKey).where(IdempotencyKey.id.in_(batch))
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        db.session.commit()
+        purged += count
+        if count < batch_size:
+            return purged
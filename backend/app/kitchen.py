@@ -0,0 +1,40 @@
+"""
+Kitchen scheduling - which queued order the cooks should start next
+
+Every order carries Order.cook_by, the sort key of the kitchen queue
+(partial index ix_orders_kitchen_queue on (location_id, cook_by, id) over
+PAID/IN_KITCHEN). It combines:
+  - the deadline: scheduled_for minus the prep time of its slowest dish
+    (MenuItem.prep_minutes, else KITCHEN_DEFAULT_PREP_MINUTES);
+  - waiting time: pulled toward created_at by KITCHEN_AGING (0..1), so of
+    two orders due together the one placed earlier goes first;
+  - cook bumps: KITCHEN_BUMP_MINUTES earlier per bump (Order.priority).
+Waiting time grows at the same rate for every queued order, so it never
+changes their relative order and is folded into the key once, when the
+order is placed; nothing is rescored while orders wait. Reading the queue
+is an index range scan, and placing, bumping or starting an order moves
+one index entry - O(log n), never a re-sort.
+"""
+from datetime import timedelta
+from flask import current_app
+
+PRIORITY_MAX = 10
+
+
+def prep_minutes(menu_items):
+    """Prep time of an order: its dishes cook in parallel, the slowest decides."""
+    default = current_app.config['KITCHEN_DEFAULT_PREP_MINUTES']
+    return max((item.prep_minutes or default for item in menu_items), default=default)
+
+
+def cook_by(scheduled_for, created_at, prep, priority=0):
+    """Queue key of an order: when it should go on the stove."""
+    key = scheduled_for - timedelta(minutes=prep)
+    if key > created_at:
+        # Pull toward the time it was placed
+        key -= (key - created_at) * current_app.config['KITCHEN_AGING']
+    return key - bump_step() * priority
+
+
+def bump_step():
+    return timedelta(minutes=current_app.config['KITCHEN_BUMP_MINUTES'])
@@ -0,0 +1,55 @@
+"""
+Response localization - dish names in the caller's language, picked in SQL
+
+The language comes from ?lang=, then Accept-Language (the web client sends
+its UI language there), then the token's `lang` claim (User.language), then
+DEFAULT_LANGUAGE. Queries select coalesce(name_<lang>, name_ru) AS name, so
+responses carry one name per dish instead of every translation.
+"""
+from flask import g, request
+from flask_jwt_extended import get_jwt
+from sqlalchemy import func
+
+LANGUAGES = ('kz', 'ru', 'en')
+DEFAULT_LANGUAGE = 'ru'
+
+# Accept-Language uses ISO 639-1, where Kazakh is 'kk'
+ALIASES = {'kk': 'kz'}
+
+
+def _from_accept_language():
+    for value, _ in request.accept_languages:
+        primary = value.split('-')[0].lower()
+        primary = ALIASES.get(primary, primary)
+        if primary in LANGUAGES:
+            return primary
+    return None
+
+
+def _from_claims():
+    try:
+        return get_jwt().get('lang')
+    except RuntimeError:  # endpoint without a token
+        return None
+
+
+def request_language():
+    """Language of the current request, one of LANGUAGES."""
+    if 'language' not in g:
+        lang = request.args.get('lang')
+        if lang not in LANGUAGES:
+            lang = _from_accept_language() or _from_claims()
+        g.language = lang if lang in LANGUAGES else DEFAULT_LANGUAGE
+    return g.language
+
+
+def localized_name(model, lang):
+    """SQL expression for `model`'s name in `lang`, falling back to Russian."""
+    if lang == 'ru':
+        return model.name_ru
+    return func.coalesce(getattr(model, f'name_{lang}'), model.name_ru)
+
+
+def pick_name(obj, lang):
+    """Same as localized_name, for an already loaded row."""
+    return getattr(obj, f'name_{lang}', None) or obj.name_ru
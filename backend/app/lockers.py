@@ -0,0 +1,103 @@
+"""
+Locker allocation - hand a READY order a free cell in one atomic statement
+
+The cell is picked and flipped to OCCUPIED by a single
+UPDATE ... WHERE id = (SELECT ... FOR UPDATE SKIP LOCKED LIMIT 1) RETURNING,
+so two cooks can never get the same cell and neither waits on the other's
+row lock. The outer `status = 'FREE'` guard keeps it safe on databases
+without SKIP LOCKED too: a lost race just updates nothing and retries.
+
+Which free cell wins is a policy (LOCKER_POLICY):
+  nearest     - lowest cell number (A1, A2, ... closest to the counter)
+  round_robin - least recently used cell, spreads wear over the locker
+  size_aware  - smallest cell that fits the order, nearest first
+"""
+from datetime import datetime
+from flask import current_app
+from sqlalchemy import select, update, case, func
+from app import db
+from app.models import LockerCell, OrderItem
+
+SIZES = ('S', 'M', 'L')
+
+# Portions that fit into each cell size; anything bigger needs an L cell
+SIZE_CAPACITY = {'S': 2, 'M': 4}
+
+# Attempts before giving up when other allocations keep winning the race
+MAX_ATTEMPTS = 3
+
+
+def _size_rank(column):
+    return case({size: rank for rank, size in enumerate(SIZES)}, value=column, else_=len(SIZES))
+
+
+def _nearest_order():
+    # 'A10' after 'A9': shorter codes first, then alphabetical
+    return (func.length(LockerCell.code), LockerCell.code)
+
+
+def nearest(query, order):
+    return query.order_by(*_nearest_order())
+
+
+def round_robin(query, order):
+    return query.order_by(LockerCell.last_assigned_at.asc().nulls_first(), *_nearest_order())
+
+
+def size_aware(query, order):
+    portions = db.session.query(func.coalesce(func.sum(OrderItem.qty), 0)).filter(
+        OrderItem.order_id == order.id).scalar()
+    needed = next((size for size, capacity in SIZE_CAPACITY.items() if portions <= capacity), 'L')
+    return query.where(
+        _size_rank(LockerCell.size) >= SIZES.index(needed)
+    ).order_by(_size_rank(LockerCell.size), *_nearest_order())
+
+
+POLICIES = {
+    'nearest': nearest,
+    'round_robin': round_robin,
+    'size_aware': size_aware,
+}
+
+
+def _occupy(location_id, candidate):
+    result = db.session.execute(
+        update(LockerCell)
+        .where(
+            LockerCell.location_id == location_id,
+            LockerCell.id == candidate.scalar_subquery(),
+            LockerCell.status == 'FREE'
+        )
+        .values(status='OCCUPIED', last_assigned_at=datetime.utcnow())
+        .returning(LockerCell.id, LockerCell.code)
+        .execution_options(synchronize_session=False)
+    )
+    return result.first()
+
+
+def allocate_cell(order, cell_code=None, policy=None):
+    """
+    Occupy a free cell for `order` (a specific one if `cell_code` is given).
+    Returns (cell_id, code) or None if nothing is free. Runs in the caller's
+    transaction: a rollback frees the cell again.
+    """
+    candidate = select(LockerCell.id).where(
+        LockerCell.location_id == order.location_id,
+        LockerCell.status == 'FREE'
+    )
+    if cell_code:
+        return _occupy(order.location_id, candidate.where(LockerCell.code == cell_code))
+
+    choose = POLICIES[policy or current_app.config['LOCKER_POLICY']]
+    candidate = choose(candidate, order).limit(1).with_for_update(skip_locked=True)
+    for _ in range(MAX_ATTEMPTS):
+        cell = _occupy(order.location_id, candidate)
+        if cell:
+            return cell
+        # Nothing free at all, or a concurrent allocation took our pick
+        if not db.session.query(LockerCell.id).filter(
+            LockerCell.location_id == order.location_id,
+            LockerCell.status == 'FREE'
+        ).first():
+            return None
+    return None
@@ -0,0 +1,84 @@
+"""
+Menu cache - current snapshot of GET /menu per (location_id, date, meal_slot, lang)
+and of GET /catalog per (org_id, 'catalog', '')
+
+Entries change only when a menu is published or edited (stock counts are
+served by GET /menu/stock, not cached). Every location has a version counter. A reader grabs the version before it
+queries and only stores its result if nobody invalidated in between, so a
+write racing a rebuild can't leave a stale entry behind. Invalidations go
+out on the event bus, so with EVENTS_BACKEND=postgres every worker drops
+its copy; the TTL is a safety net for edits made outside the API.
+"""
+import threading
+import time
+from collections import namedtuple
+from flask import current_app, request
+from app.events import bus
+from app.menu_snapshots import menu_snapshots, PUBLISH_LEVELS
+
+CHANNEL = 'cache:menu'
+MAX_ENTRIES = 1024
+
+CacheEntry = namedtuple('CacheEntry', 'digest version expires_at')
+
+
+class MenuCache:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._versions = {}  # location_id -> int
+        self._epoch = 0  # bumped by invalidate-all
+        self.ttl = 60
+
+    def init_app(self, app):
+        self.ttl = app.config['MENU_CACHE_TTL_SECONDS']
+        bus.on(CHANNEL, self._on_invalidate)
+
+    def version(self, location_id):
+        return self._epoch, self._versions.get(location_id, 0)
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry and entry.version == self.version(key[0]) and entry.expires_at > time.monotonic():
+            return entry
+        return None
+
+    def set(self, key, payload, version, levels=PUBLISH_LEVELS):
+        """Snapshot `payload`; remember it unless `key`'s location changed since `version`."""
+        entry = CacheEntry(menu_snapshots.write(payload, levels), version, time.monotonic() + self.ttl)
+        with self._lock:
+            if version == self.version(key[0]):
+                if len(self._entries) >= MAX_ENTRIES:
+                    self._entries.clear()
+                self._entries[key] = entry
+        return entry
+
+    def invalidate(self, location_id=None):
+        """Drop cached menus of one location (or all) in every worker."""
+        event = {'location_id': location_id}
+        self._on_invalidate(event)
+        bus.publish(CHANNEL, event)
+
+    def _on_invalidate(self, event):
+        location_id = event.get('location_id')
+        with self._lock:
+            if location_id is None:
+                self._epoch += 1
+                self._entries.clear()
+            else:
+                self._versions[location_id] = self._versions.get(location_id, 0) + 1
+                for key in [k for k in self._entries if k[0] == location_id]:
+                    del self._entries[key]
+
+    @staticmethod
+    def response(entry):
+        """Snapshot bytes for `entry`, or 304 if the client already has them."""
+        if request.if_none_match.contains_weak(entry.digest):
+            response = current_app.response_class(status=304)
+            response.set_etag(entry.digest, weak=True)
+            response.headers['Cache-Control'] = 'private, no-cache'
+            return response
+        return menu_snapshots.response(entry.digest)
+
+
+menu_cache = MenuCache()
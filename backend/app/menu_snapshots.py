@@ -0,0 +1,120 @@
+"""
+Menu snapshots - immutable, precompressed, content-addressed menu/catalog blobs
+
+A payload is serialized once, named by its SHA-256 and written next to its
+gzip (and brotli, if the optional `brotli` package is installed) variants:
+  <MENU_SNAPSHOT_DIR>/<digest>.json[.gz|.br]
+Requests then stream the file matching Accept-Encoding; no serialization or
+compression happens per request, and identical content built by several
+workers lands in the same file. Snapshots are built when a menu is published
+(maximum compression); one built in a request after a cache miss uses
+cheaper levels. Stock counts change with every order and are not part of a
+snapshot. Old snapshots are pruned after publishing and, at most every
+PRUNE_INTERVAL seconds, after any new snapshot.
+"""
+import gzip
+import hashlib
+import json
+import os
+import re
+import tempfile
+import time
+from flask import request, send_file
+
+try:
+    import brotli
+except ImportError:  # optional: pip install brotli to also serve br
+    brotli = None
+
+DIGEST_RE = re.compile(r'^[0-9a-f]{32}$')
+IMMUTABLE = 'public, max-age=31536000, immutable'
+PRUNE_INTERVAL = 600
+
+# (gzip, brotli) levels: best when publishing, cheap enough to build in a request
+PUBLISH_LEVELS = (9, 11)
+REQUEST_LEVELS = (6, 5)
+
+
+class MenuSnapshots:
+    def __init__(self):
+        self.directory = None
+        self.max_age = 24 * 3600
+        self._last_prune = 0
+
+    def init_app(self, app):
+        self.directory = app.config.get('MENU_SNAPSHOT_DIR') or os.path.join(
+            app.instance_path, 'menu_snapshots')
+        self.max_age = app.config['MENU_SNAPSHOT_MAX_AGE_HOURS'] * 3600
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _path(self, digest, suffix=''):
+        return os.path.join(self.directory, f'{digest}.json{suffix}')
+
+    def _write(self, path, data):
+        # Write-then-rename so readers never see a partial file
+        fd, tmp = tempfile.mkstemp(dir=self.directory)
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+    def write(self, payload, levels=PUBLISH_LEVELS):
+        """Store `payload` (if new) and return its digest."""
+        body = json.dumps(payload, ensure_ascii=False, sort_keys=True,
+                          separators=(',', ':')).encode()
+        digest = hashlib.sha256(body).hexdigest()[:32]
+
+        if not os.path.exists(self._path(digest)):
+            gzip_level, brotli_level = levels
+            self._write(self._path(digest, '.gz'), gzip.compress(body, compresslevel=gzip_level, mtime=0))
+            if brotli:
+                self._write(self._path(digest, '.br'), brotli.compress(body, quality=brotli_level))
+            # Plain file last: its presence means all variants are complete
+            self._write(self._path(digest), body)
+            if time.monotonic() - self._last_prune > PRUNE_INTERVAL:
+                self.prune()
+        else:
+            # Still current: keep it away from prune()
+            for suffix in ('', '.gz', '.br'):
+                if os.path.exists(self._path(digest, suffix)):
+                    os.utime(self._path(digest, suffix))
+        return digest
+
+    def exists(self, digest):
+        return bool(DIGEST_RE.match(digest)) and os.path.exists(self._path(digest))
+
+    def response(self, digest, cache_control='private, no-cache'):
+        """Stream the snapshot in the best encoding the client accepts."""
+        encoding = None
+        if brotli and 'br' in request.accept_encodings and os.path.exists(self._path(digest, '.br')):
+            encoding = 'br'
+        elif 'gzip' in request.accept_encodings:
+            encoding = 'gzip'
+
+        suffix = {'br': '.br', 'gzip': '.gz'}.get(encoding, '')
+        response = send_file(self._path(digest, suffix), mimetype='application/json',
+                             etag=False, conditional=False, max_age=None)
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+        response.vary.add('Accept-Encoding')
+        response.headers['Cache-Control'] = cache_control
+        response.headers['Content-Location'] = f'/api/menu/snapshots/{digest}'
+        response.set_etag(digest, weak=True)
+        return response
+
+    def prune(self):
+        """Delete snapshots older than MENU_SNAPSHOT_MAX_AGE_HOURS. Returns count."""
+        self._last_prune = time.monotonic()
+        cutoff = time.time() - self.max_age
+        removed = 0
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+                    removed += 1
+            except OSError:
+                pass
+        return removed
+
+
+menu_snapshots = MenuSnapshots()
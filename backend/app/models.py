@@ -35,6 +35,7 @@ class Location(db.Model):
     opening_time = db.Column(db.Time, nullable=False)
     closing_time = db.Column(db.Time, nullable=False)
     is_closed_manual = db.Column(db.Boolean, default=False)
+    slot_capacity = db.Column(db.Integer)  # orders the kitchen hands out per slot; null = SLOT_KITCHEN_CAPACITY
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     inventory = db.relationship('Inventory', backref='location', lazy='dynamic')
@@ -70,6 +71,7 @@ class User(db.Model):
     group_id = db.Column(db.String(36), db.ForeignKey('groups.id'), nullable=True)
     language = db.Column(db.String(5), default='ru')
     theme = db.Column(db.String(10), default='light')
+    token_version = db.Column(db.Integer, nullable=False, default=0, server_default='0')  # bump to revoke JWTs
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     orders = db.relationship('Order', backref='user', lazy='dynamic')
@@ -92,6 +94,7 @@ class MenuItem(db.Model):
     fat_100g = db.Column(db.Float)
     carbs_100g = db.Column(db.Float)
     image_url = db.Column(db.String(500))
+    prep_minutes = db.Column(db.Integer)  # null = KITCHEN_DEFAULT_PREP_MINUTES
     menu_day = db.Column(db.Integer, default=1)  # 1=Mon..5=Fri
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
@@ -111,6 +114,7 @@ class Inventory(db.Model):
     
     __table_args__ = (
         db.UniqueConstraint('location_id', 'menu_item_id', name='uq_inventory_location_item'),
+        db.Index('ix_inventory_menu_item', 'menu_item_id'),
     )
 
 
@@ -122,10 +126,15 @@ class Order(db.Model):
     id = db.Column(db.String(36), primary_key=True, default=generate_uuid)
     user_id = db.Column(db.String(36), db.ForeignKey('users.id'), nullable=False)
     location_id = db.Column(db.String(36), db.ForeignKey('locations.id'), nullable=False)
-    status = db.Column(db.String(20), nullable=False, default='CREATED')
+    daily_menu_id = db.Column(db.String(36), db.ForeignKey('daily_menus.id'), nullable=True)  # stock source
+    status = db.Column(db.String(20), nullable=False, default='CREATED')  # CREATED, PAID, IN_KITCHEN, READY, PICKED_UP, CANCELLED
     scheduled_for = db.Column(db.DateTime, nullable=False)
     total = db.Column(db.Integer, nullable=False)  # в тиынах
-    priority = db.Column(db.Integer, default=0)
+    priority = db.Column(db.Integer, default=0)  # cook bumps
+    # Kitchen queue key (app/kitchen.py); plain scheduled_for if not computed
+    cook_by = db.Column(db.DateTime, default=lambda context: context.get_current_parameters()['scheduled_for'])
+    # Stock was taken at checkout (app/stock.py); orders from before that never took any
+    stock_reserved = db.Column(db.Boolean, nullable=False, default=False, server_default=db.false())
     pickup_code = db.Column(db.String(6), nullable=True)  # 6-digit pickup code
     ready_at = db.Column(db.DateTime, nullable=True)
     picked_up_at = db.Column(db.DateTime, nullable=True)
@@ -133,6 +142,17 @@ class Order(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    __table_args__ = (
+        # GET /orders/my
+        db.Index('ix_orders_user_history', 'user_id', 'created_at', 'id'),
+        db.Index('ix_orders_status_scheduled', 'status', 'scheduled_for'),
+        # Cook queue in priority order: only the few active orders, never the whole history
+        db.Index('ix_orders_kitchen_queue', 'location_id', 'cook_by', 'id',
+                 postgresql_where=db.text("status IN ('PAID', 'IN_KITCHEN')")),
+        # Queue ETag fingerprint and ?since= feed
+        db.Index('ix_orders_location_updated', 'location_id', 'updated_at', 'id'),
+    )
+    
     items = db.relationship('OrderItem', backref='order', lazy='dynamic')
     receipt = db.relationship('Receipt', backref='order', uselist=False)
     reservation = db.relationship('LockerReservation', backref='order', uselist=False)
@@ -147,8 +167,17 @@ class OrderItem(db.Model):
     menu_item_id = db.Column(db.String(36), db.ForeignKey('menu_items.id'), nullable=False)
     qty = db.Column(db.Integer, nullable=False, default=1)
     unit_price = db.Column(db.Integer, nullable=False)
+    # Snapshot of the dish at order time: history reads never join menu_items
+    name_kz = db.Column(db.String(255))
+    name_ru = db.Column(db.String(255))
+    name_en = db.Column(db.String(255))
+    category = db.Column(db.String(50))
     modifiers_json = db.Column(db.JSON)
     comment = db.Column(db.String(500))
+    
+    __table_args__ = (
+        db.Index('ix_order_items_order', 'order_id'),
+    )
 
 
 class Receipt(db.Model):
@@ -160,6 +189,38 @@ class Receipt(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
 
+class IdempotencyKey(db.Model):
+    """First response to a request sent with an Idempotency-Key header."""
+    __tablename__ = 'idempotency_keys'
+    
+    id = db.Column(db.String(36), primary_key=True, default=generate_uuid)
+    user_id = db.Column(db.String(36), nullable=False)  # no FK: deleting a user must not block
+    key = db.Column(db.String(255), nullable=False)
+    request_hash = db.Column(db.String(64), nullable=False)  # endpoint + body
+    status_code = db.Column(db.Integer, nullable=False)
+    response_body = db.Column(db.JSON, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'key', name='uq_idempotency_user_key'),
+        db.Index('ix_idempotency_keys_created', 'created_at'),
+    )
+
+
+class PickupSlot(db.Model):
+    """Orders booked into one SLOT_MINUTES bucket of a location."""
+    __tablename__ = 'pickup_slots'
+    
+    id = db.Column(db.String(36), primary_key=True, default=generate_uuid)
+    location_id = db.Column(db.String(36), db.ForeignKey('locations.id'), nullable=False)
+    starts_at = db.Column(db.DateTime, nullable=False)
+    booked = db.Column(db.Integer, nullable=False, default=0)
+    
+    __table_args__ = (
+        db.UniqueConstraint('location_id', 'starts_at', name='uq_pickup_slot_location_start'),
+    )
+
+
 # ==================== Locker/Pickup Tables ====================
 
 class LockerCell(db.Model):
@@ -168,10 +229,13 @@ class LockerCell(db.Model):
     id = db.Column(db.String(36), primary_key=True, default=generate_uuid)
     location_id = db.Column(db.String(36), db.ForeignKey('locations.id'), nullable=False)
     code = db.Column(db.String(5), nullable=False)  # A1..A10
-    status = db.Column(db.String(20), default='FREE')  # FREE, RESERVED, OCCUPIED
+    status = db.Column(db.String(20), default='FREE')  # FREE, RESERVED, OCCUPIED, EXPIRED (hold ran out, staff empty it)
+    size = db.Column(db.String(1), nullable=False, default='M', server_default='M')  # S, M, L
+    last_assigned_at = db.Column(db.DateTime)  # round-robin wear leveling
     
     __table_args__ = (
         db.UniqueConstraint('location_id', 'code', name='uq_cell_location_code'),
+        db.Index('ix_locker_cells_location_status', 'location_id', 'status'),
     )
     
     reservations = db.relationship('LockerReservation', backref='cell', lazy='dynamic')
@@ -190,6 +254,9 @@ class LockerReservation(db.Model):
     __table_args__ = (
         db.Index('idx_active_cell_reservation', 'cell_id', 
                  postgresql_where=(db.text('released_at IS NULL'))),
+        # Expiry sweeps: only unreleased holds, oldest deadline first
+        db.Index('ix_locker_reservations_expiry', 'hold_until',
+                 postgresql_where=(db.text('released_at IS NULL'))),
     )
 
 
@@ -199,7 +266,7 @@ class PickupToken(db.Model):
     id = db.Column(db.String(36), primary_key=True, default=generate_uuid)
     order_id = db.Column(db.String(36), db.ForeignKey('orders.id'), nullable=False)
     qr_token = db.Column(db.String(64), nullable=False, unique=True)
-    pin_code = db.Column(db.String(6), nullable=False)
+    pin_code = db.Column(db.String(64), nullable=False)  # pin_digest(), not the PIN
     token_expires_at = db.Column(db.DateTime, nullable=False)
     used_at = db.Column(db.DateTime)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
@@ -207,6 +274,7 @@ class PickupToken(db.Model):
     __table_args__ = (
         db.Index('idx_pickup_token_expires', 'token_expires_at',
                  postgresql_where=(db.text('used_at IS NULL'))),
+        db.Index('ix_pickup_tokens_order', 'order_id'),
     )
 
 
@@ -241,5 +309,9 @@ class DailyMenuItem(db.Model):
     stock_qty = db.Column(db.Integer, nullable=True)  # null = unlimited
     is_available = db.Column(db.Boolean, default=True)
     
+    __table_args__ = (
+        db.Index('ix_daily_menu_items_menu_item', 'daily_menu_id', 'menu_item_id'),
+    )
+    
     menu_item = db.relationship('MenuItem', backref='daily_menu_entries')
 
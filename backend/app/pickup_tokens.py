@@ -0,0 +1,105 @@
+"""
+Pickup tokens - single-use QR tokens and PINs for collecting READY orders
+
+Only the SHA-256 of a QR token is stored (PickupToken.qr_token, unique), so
+a leaked table can't be used to empty lockers and a claim is one unique
+index lookup. The raw token is handed out once, when the order turns READY.
+The PIN is stored as an HMAC keyed with PIN_PEPPER (else JWT_SECRET_KEY)
+over order id + PIN: a 6-digit PIN is trivial to brute-force from a plain
+hash, but not without the server-side key.
+
+With KIOSK_SIGNING_KEY set, tokens are signed so a locker kiosk holding the
+same key can check them offline:
+    <base64url(json payload)>.<base64url(HMAC-SHA256(key, first part))>
+payload = {o: order_id, l: location_id, c: cell_code, e: expiry (unix), n: nonce}
+The kiosk opens the cell, remembers the token and later syncs its claims
+through POST /api/pickup/claims:batch.
+"""
+import base64
+import hashlib
+import hmac
+import json
+import secrets
+import time
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import update
+from app import db
+from app.models import PickupToken
+
+
+def hash_token(token):
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def pin_digest(order_id, pin):
+    """What PickupToken.pin_code stores for `pin` of order `order_id`."""
+    key = current_app.config['PIN_PEPPER'] or current_app.config['JWT_SECRET_KEY']
+    return hmac.new(key.encode(), f'{order_id}:{pin}'.encode(), hashlib.sha256).hexdigest()
+
+
+def _b64encode(data):
+    return base64.urlsafe_b64encode(data).rstrip(b'=').decode()
+
+
+def _b64decode(text):
+    return base64.urlsafe_b64decode(text + '=' * (-len(text) % 4))
+
+
+def _signature(key, body):
+    return _b64encode(hmac.new(key.encode(), body.encode(), hashlib.sha256).digest())
+
+
+def sign_token(payload, key):
+    body = _b64encode(json.dumps(payload, separators=(',', ':')).encode())
+    return f'{body}.{_signature(key, body)}'
+
+
+def verify_signed_token(token, key, now=None):
+    """Payload of a kiosk token if the signature is valid and it hasn't expired, else None."""
+    try:
+        body, signature = token.split('.')
+        if not hmac.compare_digest(signature, _signature(key, body)):
+            return None
+        payload = json.loads(_b64decode(body))
+    except (ValueError, AttributeError):
+        return None
+    if payload.get('e', 0) <= (now if now is not None else time.time()):
+        return None
+    return payload
+
+
+def issue_pickup_token(order, pin_code, cell_code=None):
+    """Add a PickupToken for `order` to the session. Returns the raw QR token."""
+    expires_at = datetime.utcnow() + timedelta(minutes=current_app.config['PICKUP_TOKEN_TTL_MINUTES'])
+    key = current_app.config['KIOSK_SIGNING_KEY']
+    if key:
+        token = sign_token({
+            'o': order.id,
+            'l': order.location_id,
+            'c': cell_code,
+            'e': int((expires_at - datetime(1970, 1, 1)).total_seconds()),
+            'n': secrets.token_urlsafe(8),
+        }, key)
+    else:
+        token = secrets.token_urlsafe(32)
+    db.session.add(PickupToken(
+        order_id=order.id,
+        qr_token=hash_token(token),
+        pin_code=pin_digest(order.id, pin_code),
+        token_expires_at=expires_at
+    ))
+    return token
+
+
+def use_token(condition):
+    """Mark the live token matching `condition` used. Returns its order_id or None."""
+    now = datetime.utcnow()
+    result = db.session.execute(
+        update(PickupToken)
+        .where(condition, PickupToken.used_at.is_(None), PickupToken.token_expires_at > now)
+        .values(used_at=now)
+        .returning(PickupToken.order_id)
+        .execution_options(synchronize_session=False)
+    )
+    return result.scalar()
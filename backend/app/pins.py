@@ -0,0 +1,70 @@
+"""
+PIN hashing policy - cheap enough for a whole school logging in at 8:00
+
+A 4-6 digit PIN has at most a million values, so no hash cost makes a
+stolen table safe on its own. What protects it is PIN_PEPPER, a server-side
+secret mixed in with HMAC before hashing: without it the hashes can't be
+brute-forced offline. That lets PIN_HASH_METHOD stay at a few milliseconds
+per check; online guessing is capped by the login rate limits in
+app/routes/auth.py (per login and per client IP), not by hash cost.
+Without a pepper nothing else protects a leaked table, so PIN_HASH_METHOD
+then defaults to werkzeug's scrypt and hashes are never made cheaper.
+
+Hashes made under an older method (werkzeug's scrypt default, or before the
+pepper was set) verify as before and are rewritten on the next login.
+"""
+import hashlib
+import hmac
+from flask import current_app
+from werkzeug.security import generate_password_hash, check_password_hash
+
+PEPPERED_PREFIX = 'peppered$'
+
+_dummy_hashes = {}  # PIN_HASH_METHOD -> hash of a throwaway value
+
+
+def _pepper(pin):
+    pepper = current_app.config['PIN_PEPPER']
+    if not pepper:
+        return str(pin)
+    return hmac.new(pepper.encode(), str(pin).encode(), hashlib.sha256).hexdigest()
+
+
+def _dummy_hash():
+    method = current_app.config['PIN_HASH_METHOD']
+    if method not in _dummy_hashes:
+        _dummy_hashes[method] = generate_password_hash('0', method=method)
+    return _dummy_hashes[method]
+
+
+def hash_pin(pin):
+    """Hash `pin` with the current PIN_HASH_METHOD (and PIN_PEPPER, if set)."""
+    pin_hash = generate_password_hash(_pepper(pin), method=current_app.config['PIN_HASH_METHOD'])
+    return PEPPERED_PREFIX + pin_hash if current_app.config['PIN_PEPPER'] else pin_hash
+
+
+def verify_pin(pin_hash, pin):
+    """
+    Returns (ok, needs_rehash). needs_rehash is True when `pin_hash` was made
+    under a different method or pepper setting than the current one.
+    Pass pin_hash=None for an unknown login: it still costs one hash check,
+    so response time doesn't tell which logins exist.
+    """
+    if pin_hash is None:
+        check_password_hash(_dummy_hash(), str(pin))
+        return False, False
+
+    peppered = pin_hash.startswith(PEPPERED_PREFIX)
+    if peppered:
+        pin_hash = pin_hash[len(PEPPERED_PREFIX):]
+        if not current_app.config['PIN_PEPPER']:
+            return False, False
+    if not check_password_hash(pin_hash, _pepper(pin) if peppered else str(pin)):
+        return False, False
+
+    # werkzeug fills in defaults ('pbkdf2' -> 'pbkdf2:sha256:1000000'), so
+    # compare with what it actually produces for the configured method
+    current_method = _dummy_hash().split('$', 1)[0]
+    needs_rehash = (peppered != bool(current_app.config['PIN_PEPPER'])
+                    or pin_hash.split('$', 1)[0] != current_method)
+    return True, needs_rehash
@@ -0,0 +1,62 @@
+"""
+Sliding-window rate limiter - in-memory, per worker process
+
+Keeps the timestamps of recent hits per key and refuses a hit once `limit`
+of them fall inside the last `window` seconds. Checked before any database
+work, so a flood of bad guesses costs no connections.
+"""
+import math
+import threading
+import time
+from collections import deque
+from flask import jsonify
+
+MAX_KEYS = 10000
+
+
+class SlidingWindowLimiter:
+    def __init__(self, limit, window):
+        self.limit = limit
+        self.window = window
+        self._lock = threading.Lock()
+        self._hits = {}  # key -> deque of monotonic timestamps
+
+    def hit(self, key):
+        """Record a hit for `key`. Returns seconds to wait if over the limit, else 0."""
+        now = time.monotonic()
+        with self._lock:
+            hits = self._hits.get(key)
+            if hits is None:
+                if len(self._hits) >= MAX_KEYS:
+                    self._evict(now)
+                    if len(self._hits) >= MAX_KEYS:
+                        # Full of live keys: refuse newcomers rather than forget
+                        # anyone's count (keys can be client-chosen, e.g. order ids)
+                        return self.window
+                hits = self._hits[key] = deque()
+            while hits and hits[0] <= now - self.window:
+                hits.popleft()
+            if len(hits) >= self.limit:
+                return hits[0] + self.window - now
+            hits.append(now)
+            return 0
+
+    def reset(self, key):
+        with self._lock:
+            self._hits.pop(key, None)
+
+    def _evict(self, now):
+        # Drop keys with no hits left in the window; live counts are never reset
+        for key in [k for k, hits in self._hits.items() if not hits or hits[-1] <= now - self.window]:
+            del self._hits[key]
+
+
+def too_many_attempts(retry_after):
+    """429 response for a refused hit, with Retry-After in whole seconds."""
+    response = jsonify({
+        'error': 'too_many_attempts',
+        'message': 'Слишком много попыток, попробуйте позже'
+    })
+    response.status_code = 429
+    response.headers['Retry-After'] = str(math.ceil(retry_after))
+    return response
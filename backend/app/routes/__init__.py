@@ -4,3 +4,4 @@ from app.routes.orders import bp as orders_bp
 from app.routes.cook import bp as cook_bp
 from app.routes.pickup import bp as pickup_bp
 from app.routes.admin import bp as admin_bp
+from app.routes.stream import bp as stream_bp
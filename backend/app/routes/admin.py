@@ -3,8 +3,10 @@ Admin routes - menu management, users CRUD, groups management
 """
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt, get_jwt_identity
-from werkzeug.security import generate_password_hash
+from sqlalchemy import case, insert, update
 from app import db
+from app.current_user import current_user, token_versions
+from app.pins import hash_pin
 from app.models import MenuItem, Inventory, Location, User, Group
 
 bp = Blueprint('admin', __name__)
@@ -19,43 +21,62 @@ def admin_required():
 
 
 def get_admin_user():
-    """Get the current admin User object."""
-    admin_id = get_jwt_identity()
-    return User.query.get(admin_id)
+    """The current admin (id, org_id, group_id, role) from token claims."""
+    return current_user()
 
 
 # ==================== Menu ====================
 
+def _admin_location(admin):
+    """Location the menu editor works on: ?location_id= or the org's first one."""
+    query = Location.query.filter_by(org_id=admin.org_id)
+    location_id = request.args.get('location_id')
+    if location_id:
+        query = query.filter_by(id=location_id)
+    return query.first()
+
+
+def _admin_menu_items(location):
+    # One joined read: every org dish with its stock at this location
+    rows = db.session.query(
+        MenuItem, Inventory.id, Inventory.stock_qty, Inventory.is_available
+    ).outerjoin(
+        Inventory, (Inventory.menu_item_id == MenuItem.id) & (Inventory.location_id == location.id)
+    ).filter(MenuItem.org_id == location.org_id).order_by(MenuItem.category, MenuItem.name_ru)
+    
+    return [{
+        'id': item.id,
+        'name_kz': item.name_kz,
+        'name_ru': item.name_ru,
+        'name_en': item.name_en or '',
+        'price': item.base_price,
+        'category': item.category,
+        'qty': stock_qty if inventory_id else 0,
+        'available': available if inventory_id else False
+    } for item, inventory_id, stock_qty, available in rows]
+
+
 @bp.route('/menu', methods=['GET'])
 @jwt_required()
 def get_admin_menu():
-    """Get full menu for admin editing"""
+    """Get full menu for admin editing. Query: location_id"""
     if not admin_required():
         return jsonify({'error': 'forbidden', 'message': 'Admin access required'}), 403
     
-    items = MenuItem.query.all()
+    location = _admin_location(get_admin_user())
+    if not location:
+        return jsonify({'error': 'location_not_found'}), 404
     
-    result = []
-    for item in items:
-        inv = Inventory.query.filter_by(menu_item_id=item.id).first()
-        result.append({
-            'id': item.id,
-            'name_kz': item.name_kz,
-            'name_ru': item.name_ru,
-            'name_en': item.name_en or '',
-            'price': item.base_price,
-            'category': item.category,
-            'qty': inv.stock_qty if inv else 0,
-            'available': inv.is_available if inv else False
-        })
-    
-    return jsonify({'items': result})
+    return jsonify({'location_id': location.id, 'items': _admin_menu_items(location)})
 
 
 @bp.route('/menu', methods=['PUT'])
 @jwt_required()
 def update_admin_menu():
-    """Update menu items (qty, available)"""
+    """
+    Update stock of many menu items at once (qty, available). Query: location_id.
+    A fixed number of statements however many items are sent.
+    """
     if not admin_required():
         return jsonify({'error': 'forbidden', 'message': 'Admin access required'}), 403
     
@@ -63,22 +84,62 @@ def update_admin_menu():
     if not data or 'items' not in data:
         return jsonify({'error': 'missing_items', 'message': 'items array required'}), 400
     
-    updated = []
+    location = _admin_location(get_admin_user())
+    if not location:
+        return jsonify({'error': 'location_not_found'}), 404
+    
+    qty_by_item = {}
+    available_by_item = {}
     for item_data in data['items']:
         item_id = item_data.get('id')
         if not item_id:
             continue
-        inv = Inventory.query.filter_by(menu_item_id=item_id).first()
-        if not inv:
-            continue
         if 'qty' in item_data:
-            inv.stock_qty = item_data['qty']
+            qty = item_data['qty']
+            if qty is not None and (not isinstance(qty, int) or isinstance(qty, bool) or qty < 0):
+                return jsonify({'error': 'invalid_qty', 'item_id': item_id,
+                                'message': 'qty must be a non-negative integer or null'}), 400
+            qty_by_item[item_id] = qty
         if 'available' in item_data:
-            inv.is_available = item_data['available']
-        updated.append(item_id)
+            available_by_item[item_id] = bool(item_data['available'])
     
-    db.session.commit()
-    return get_admin_menu()
+    item_ids = set(qty_by_item) | set(available_by_item)
+    if item_ids:
+        # Which of the sent dishes belong to this org, and which already have stock here
+        rows = db.session.query(MenuItem.id, Inventory.id).outerjoin(
+            Inventory, (Inventory.menu_item_id == MenuItem.id) & (Inventory.location_id == location.id)
+        ).filter(MenuItem.org_id == location.org_id, MenuItem.id.in_(item_ids)).all()
+        existing = [item_id for item_id, inventory_id in rows if inventory_id]
+        missing = [item_id for item_id, inventory_id in rows if not inventory_id]
+        
+        # One UPDATE for all existing rows: CASE picks each item's new value
+        values = {}
+        if qty_by_item:
+            values['stock_qty'] = case(qty_by_item, value=Inventory.menu_item_id,
+                                       else_=Inventory.stock_qty)
+        if available_by_item:
+            values['is_available'] = case(available_by_item, value=Inventory.menu_item_id,
+                                          else_=Inventory.is_available)
+        if existing:
+            db.session.execute(
+                update(Inventory)
+                .where(Inventory.location_id == location.id, Inventory.menu_item_id.in_(existing))
+                .values(**values)
+                .execution_options(synchronize_session=False)
+            )
+        
+        # Dishes never stocked here before: one executemany INSERT
+        if missing:
+            db.session.execute(insert(Inventory), [{
+                'location_id': location.id,
+                'menu_item_id': item_id,
+                'stock_qty': qty_by_item.get(item_id),
+                'is_available': available_by_item.get(item_id, True),
+            } for item_id in missing])
+        
+        db.session.commit()
+    
+    return jsonify({'location_id': location.id, 'items': _admin_menu_items(location)})
 
 
 # ==================== Users CRUD ====================
@@ -145,7 +206,7 @@ def create_user():
     new_user = User(
         org_id=admin.org_id,
         login=login,
-        pin_hash=generate_password_hash(pin),
+        pin_hash=hash_pin(pin),
         role=role,
         display_name=display_name
     )
@@ -175,14 +236,22 @@ def update_user(user_id):
     if not data:
         return jsonify({'error': 'missing_data', 'message': 'Request body required'}), 400
     
+    # Role and PIN changes log the user out everywhere
+    revoke = False
     if 'role' in data and data['role'] in ('user', 'cook', 'admin'):
+        revoke = revoke or user.role != data['role']
         user.role = data['role']
     if 'display_name' in data:
         user.display_name = data['display_name']
     if 'pin' in data and data['pin']:
-        user.pin_hash = generate_password_hash(data['pin'])
+        user.pin_hash = hash_pin(data['pin'])
+        revoke = True
+    if revoke:
+        token_versions.bump(user)
     
     db.session.commit()
+    if revoke:
+        token_versions.invalidate(user.id)
     return jsonify({'user': user_to_dict(user)})
 
 
@@ -212,6 +281,7 @@ def delete_user(user_id):
     
     db.session.delete(user)
     db.session.commit()
+    token_versions.invalidate(user_id)
     return jsonify({'success': True, 'message': 'User deleted'})
 
 
@@ -315,5 +385,6 @@ def assign_group(user_id):
             return jsonify({'error': 'forbidden', 'message': 'Cannot assign group from another org'}), 403
         user.group_id = group_id
 
+    # Not a permission change: the group_id claim catches up on next login
     db.session.commit()
     return jsonify({'user': user_to_dict(user)})
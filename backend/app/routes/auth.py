@@ -3,11 +3,21 @@ Auth routes - POST /auth/login
 """
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import create_access_token
-from werkzeug.security import check_password_hash
+from sqlalchemy.orm import joinedload
+from app import db
 from app.models import User
+from app.current_user import user_claims
+from app.pins import hash_pin, verify_pin
+from app.rate_limit import SlidingWindowLimiter, too_many_attempts
 
 bp = Blueprint('auth', __name__)
 
+# PINs are cheap to hash, so guessing is capped here. A whole class logs in
+# from one school NAT at 8:00, so the per-IP budget is wide; a single login
+# gets a few tries before it locks for a while.
+ip_limiter = SlidingWindowLimiter(limit=300, window=60)
+login_limiter = SlidingWindowLimiter(limit=10, window=900)
+
 
 @bp.route('/login', methods=['POST'])
 def login():
@@ -16,19 +26,25 @@ def login():
     if not data or 'login' not in data or 'pin' not in data:
         return jsonify({'error': 'missing_fields', 'message': 'login и pin обязательны'}), 400
     
-    user = User.query.filter_by(login=data['login']).first()
+    retry_after = ip_limiter.hit(request.remote_addr) or login_limiter.hit(str(data['login']))
+    if retry_after:
+        return too_many_attempts(retry_after)
+    
+    # Group comes with the user in the same query
+    user = User.query.options(joinedload(User.group)).filter_by(login=data['login']).first()
     
-    if not user or not check_password_hash(user.pin_hash, data['pin']):
+    ok, needs_rehash = verify_pin(user.pin_hash if user else None, data['pin'])
+    if not ok:
         return jsonify({'error': 'invalid_credentials', 'message': 'Неверный логин или PIN'}), 401
+    login_limiter.reset(str(data['login']))
     
-    # Create JWT token with user info
-    access_token = create_access_token(
-        identity=user.id,
-        additional_claims={
-            'role': user.role,
-            'display_name': user.display_name
-        }
-    )
+    # Move old hashes (werkzeug defaults, no pepper) to the current policy
+    if needs_rehash:
+        user.pin_hash = hash_pin(data['pin'])
+        db.session.commit()
+    
+    # Create JWT token with everything requests authorize on (no user lookups later)
+    access_token = create_access_token(identity=user.id, additional_claims=user_claims(user))
 
     # Build group info
     group_info = None
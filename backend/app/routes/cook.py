@@ -1,20 +1,38 @@
 """
-Cook routes - GET /cook/orders/queue, POST /cook/orders/{id}/ready
+Cook routes - GET /cook/orders/queue (?since=, ETag), POST /cook/orders/{id}/ready
              GET /cook/daily-menu, PUT /cook/daily-menu
+             GET /cook/cells/expired, POST /cook/cells/{id}/clear
 """
+import hashlib
 import secrets
 import random
-from datetime import datetime, date as date_type, timedelta
-from flask import Blueprint, request, jsonify
+from datetime import datetime, date as date_type, timedelta, timezone
+from flask import Blueprint, request, jsonify, make_response
 from flask_jwt_extended import jwt_required, get_jwt, get_jwt_identity
-from app import db
+from sqlalchemy import case, tuple_, func, select, update
+from app import db, kitchen
+from app.cursors import encode_cursor, parse_cursor
+from app.events import bus
+from app.localization import localized_name, request_language
+from app.lockers import allocate_cell
+from app.pickup_tokens import issue_pickup_token
+from app.slots import MAX_AHEAD, bucket_start, slot_length
+from app.routes.menu import publish_menu
 from app.models import (
-    Order, LockerCell, LockerReservation, Location,
-    MenuItem, DailyMenu, DailyMenuItem
+    Order, OrderItem, User, LockerCell, LockerReservation, Location,
+    DailyMenu, DailyMenuItem
 )
 
 bp = Blueprint('cook', __name__)
 
+QUEUE_STATUSES = ('PAID', 'IN_KITCHEN')
+QUEUE_PAGE_SIZE = 100
+QUEUE_MAX_PAGE_SIZE = 500
+# updated_at is set by the app before it commits, so a slow transaction can
+# land behind rows a poll already returned. ?since= cursors never pass
+# now - SINCE_OVERLAP: the newest rows are sent again until they have settled.
+SINCE_OVERLAP = timedelta(seconds=10)
+
 
 # ==================== Daily Menu ====================
 
@@ -160,6 +178,7 @@ def save_daily_menu():
             db.session.add(dmi)
     
     db.session.commit()
+    publish_menu(location, menu_date, meal_slot)
     
     return jsonify({
         'ok': True,
@@ -170,32 +189,249 @@ def save_daily_menu():
 
 # ==================== Order Queue ====================
 
+def _settled():
+    # Every change before this has committed (see SINCE_OVERLAP)
+    return datetime.utcnow() - SINCE_OVERLAP, ''
+
+
+def _queue_query(location_id):
+    """Only the columns the kitchen screen needs, user name joined in."""
+    query = db.session.query(
+        Order.id, Order.status, Order.scheduled_for, Order.total, Order.priority,
+        Order.cook_by, Order.updated_at, User.display_name
+    ).join(User, Order.user_id == User.id)
+    if location_id:
+        query = query.filter(Order.location_id == location_id)
+    return query
+
+
+def _serialize_queue(rows, lang):
+    # All lines for the given orders in one query
+    items_by_order = {}
+    if rows:
+        lines = db.session.query(
+            OrderItem.order_id, localized_name(OrderItem, lang), OrderItem.qty
+        ).filter(OrderItem.order_id.in_([row.id for row in rows]))
+        for order_id, name, qty in lines:
+            items_by_order.setdefault(order_id, []).append({'name': name, 'qty': qty})
+    
+    return [{
+        'id': row.id,
+        'status': row.status,
+        'scheduled_for': row.scheduled_for.isoformat(),
+        'cook_by': row.cook_by.isoformat() if row.cook_by else None,
+        'priority': row.priority or 0,
+        'total': row.total,
+        'items': items_by_order.get(row.id, []),
+        'user': {
+            'display_name': row.display_name
+        }
+    } for row in rows]
+
+
 @bp.route('/orders/queue', methods=['GET'])
 @jwt_required()
 def get_queue():
+    """
+    Kitchen queue. Query: location_id, limit,
+    cursor (next_cursor of the previous page) or since (incremental feed).
+    The feed re-sends changes of the last SINCE_OVERLAP seconds on every
+    poll; clients merge orders and removals by id.
+    """
     claims = get_jwt()
     if claims.get('role') not in ['cook', 'admin']:
         return jsonify({'error': 'forbidden', 'message': 'Только для повара'}), 403
     
-    # Get orders in PAID or IN_KITCHEN status
-    orders = Order.query.filter(
-        Order.status.in_(['PAID', 'IN_KITCHEN'])
-    ).order_by(Order.scheduled_for.asc()).all()
+    location_id = request.args.get('location_id')
+    lang = request_language()
+    limit = min(max(request.args.get('limit', QUEUE_PAGE_SIZE, type=int), 1), QUEUE_MAX_PAGE_SIZE)
+    
+    # Queue fingerprint in one round trip (no rows loaded): latest change to
+    # any order past CREATED + number of queued orders. Unchanged -> 304.
+    # Two scalar subqueries so each one stays on its own index
+    # (ix_orders_location_updated, ix_orders_kitchen_queue) instead of
+    # aggregating the whole order history.
+    last_change_q = select(func.max(Order.updated_at)).where(Order.status != 'CREATED')
+    queued_q = select(func.count()).select_from(Order).where(Order.status.in_(QUEUE_STATUSES))
+    if location_id:
+        last_change_q = last_change_q.where(Order.location_id == location_id)
+        queued_q = queued_q.where(Order.location_id == location_id)
+    last_change, queued = db.session.query(
+        last_change_q.scalar_subquery(), queued_q.scalar_subquery()
+    ).one()
+    
+    etag = hashlib.md5(
+        f"{request.query_string.decode()}|{lang}|{last_change}|{queued}".encode()
+    ).hexdigest()
+    # A change still settling may be joined by one committed late with an older
+    # updated_at, which this fingerprint can't see: no 304 until it settles
+    settling = last_change is not None and last_change > _settled()[0]
+    if not settling and request.if_none_match.contains_weak(etag):
+        response = make_response('', 304)
+        response.set_etag(etag, weak=True)
+        return response
+    
+    since = request.args.get('since')
+    if since:
+        # Incremental feed: everything touched after the cursor, in change order
+        try:
+            after_ts, after_id = parse_cursor(since)
+        except ValueError:
+            return jsonify({'error': 'invalid_cursor'}), 400
+        
+        rows = _queue_query(location_id).filter(
+            Order.status != 'CREATED',
+            tuple_(Order.updated_at, Order.id) > tuple_(after_ts, after_id)
+        ).order_by(Order.updated_at.asc(), Order.id.asc()).limit(limit + 1).all()
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        
+        if rows:
+            last = min((rows[-1].updated_at, rows[-1].id), _settled())
+            since = encode_cursor(*last)
+            # Rows past the settled point come again anyway; don't page through them
+            has_more = has_more and last[1] == rows[-1].id
+        
+        response = jsonify({
+            'orders': _serialize_queue([row for row in rows if row.status in QUEUE_STATUSES], lang),
+            'removed': [row.id for row in rows if row.status not in QUEUE_STATUSES],
+            'since': since,
+            'has_more': has_more
+        })
+        response.set_etag(etag, weak=True)
+        return response
+    
+    query = _queue_query(location_id).filter(Order.status.in_(QUEUE_STATUSES))
+    
+    # Priority order (app/kitchen.py), keyset pagination on (cook_by, id) — no OFFSET scans
+    cursor = request.args.get('cursor')
+    if cursor:
+        try:
+            after_ts, after_id = parse_cursor(cursor)
+        except ValueError:
+            return jsonify({'error': 'invalid_cursor'}), 400
+        query = query.filter(tuple_(Order.cook_by, Order.id) > tuple_(after_ts, after_id))
+    
+    rows = query.order_by(Order.cook_by.asc(), Order.id.asc()).limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    
+    next_cursor = None
+    if has_more:
+        last = rows[-1]
+        next_cursor = encode_cursor(last.cook_by, last.id)
+    
+    # Start point for ?since= polling: the latest change, or the settled point before it
+    since = None
+    if last_change:
+        latest = db.session.query(Order.updated_at, Order.id).filter(
+            Order.status != 'CREATED',
+            Order.updated_at == last_change
+        )
+        if location_id:
+            latest = latest.filter(Order.location_id == location_id)
+        row = latest.order_by(Order.id.desc()).first()
+        latest = min(tuple(row) if row else (last_change, ''), _settled())
+        since = encode_cursor(*latest)
+    
+    response = jsonify({
+        'orders': _serialize_queue(rows, lang),
+        'next_cursor': next_cursor,
+        'since': since
+    })
+    response.set_etag(etag, weak=True)
+    return response
+
+
+def _parse_utc(value):
+    """ISO time from the query string as naive UTC, like Order.scheduled_for."""
+    moment = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if moment.tzinfo:
+        moment = moment.astimezone(timezone.utc).replace(tzinfo=None)
+    return moment
+
+
+def _prep_sheet_query(location_id, lang, start, end, length):
+    """
+    Portions per dish and time bucket of queued orders, one GROUP BY.
+    Bucket n covers [start + n*length, start + (n+1)*length); -1 is overdue.
+    """
+    boundaries = []
+    moment = start
+    while moment < end:
+        moment += length
+        boundaries.append(moment)
+    # Exact bucket edges on every database, no date arithmetic in SQL
+    bucket = case(
+        (Order.scheduled_for < start, -1),
+        *[(Order.scheduled_for < edge, n) for n, edge in enumerate(boundaries)],
+        else_=len(boundaries) - 1
+    ).label('bucket')
+    
+    query = db.session.query(
+        bucket,
+        OrderItem.menu_item_id,
+        func.max(OrderItem.category).label('category'),
+        func.max(localized_name(OrderItem, lang)).label('name'),
+        func.sum(OrderItem.qty).label('qty')
+    ).join(Order, OrderItem.order_id == Order.id).filter(
+        Order.status.in_(QUEUE_STATUSES),
+        Order.scheduled_for < end
+    )
+    if location_id:
+        query = query.filter(Order.location_id == location_id)
+    return query.group_by(bucket, OrderItem.menu_item_id)
+
+
+@bp.route('/prep-sheet', methods=['GET'])
+@jwt_required()
+def get_prep_sheet():
+    """
+    What to cook: portions per dish across PAID/IN_KITCHEN orders, by pickup
+    slot and category. Query: location_id, from, to (ISO; default now .. +3h).
+    Overdue orders are listed first with starts_at null.
+    """
+    claims = get_jwt()
+    if claims.get('role') not in ['cook', 'admin']:
+        return jsonify({'error': 'forbidden', 'message': 'Только для повара'}), 403
+    
+    now = datetime.utcnow()
+    try:
+        start = _parse_utc(request.args['from']) if request.args.get('from') else now
+        end = _parse_utc(request.args['to']) if request.args.get('to') else now + MAX_AHEAD
+    except ValueError:
+        return jsonify({'error': 'invalid_window', 'message': 'from/to: YYYY-MM-DDTHH:MM'}), 400
+    start = bucket_start(start)
+    if end <= start or end - start > timedelta(hours=24):
+        return jsonify({'error': 'invalid_window', 'message': 'Окно от 1 слота до 24 часов'}), 400
+    
+    length = slot_length()
+    location_id = request.args.get('location_id')
+    rows = _prep_sheet_query(location_id, request_language(), start, end, length).all()
+    
+    # Folding the aggregated rows (dishes x buckets), not orders
+    buckets = {}
+    totals = {}
+    for row in sorted(rows, key=lambda r: (r.bucket, r.category or '', r.name or '')):
+        categories = buckets.setdefault(row.bucket, {})
+        categories.setdefault(row.category, []).append(
+            {'menu_item_id': row.menu_item_id, 'name': row.name, 'qty': row.qty})
+        total = totals.setdefault(row.menu_item_id, {
+            'menu_item_id': row.menu_item_id, 'name': row.name,
+            'category': row.category, 'qty': 0})
+        total['qty'] += row.qty
     
     return jsonify({
-        'orders': [{
-            'id': order.id,
-            'status': order.status,
-            'scheduled_for': order.scheduled_for.isoformat(),
-            'total': order.total,
-            'items': [{
-                'name': item.menu_item.name_ru,
-                'qty': item.qty
-            } for item in order.items],
-            'user': {
-                'display_name': order.user.display_name
-            }
-        } for order in orders]
+        'location_id': location_id,
+        'from': start.isoformat(),
+        'to': end.isoformat(),
+        'slot_minutes': int(length.total_seconds() // 60),
+        'buckets': [{
+            'starts_at': (start + length * n).isoformat() if n >= 0 else None,
+            'categories': [{'category': category, 'items': items}
+                           for category, items in categories.items()]
+        } for n, categories in sorted(buckets.items())],
+        'totals': sorted(totals.values(), key=lambda t: (t['category'] or '', t['name'] or ''))
     })
 
 
@@ -210,37 +446,30 @@ def mark_ready(order_id):
     if not order:
         return jsonify({'error': 'order_not_found'}), 404
     
-    if order.status not in ['PAID', 'IN_KITCHEN']:
+    # Generate 6-digit pickup code if not already set
+    pickup_code = order.pickup_code or f"{random.randint(0, 999999):06d}"
+    
+    # Compare-and-set, so a double click can't give one order two cells
+    result = db.session.execute(
+        update(Order)
+        .where(Order.id == order.id, Order.status.in_(QUEUE_STATUSES))
+        .values(status='READY', ready_at=datetime.utcnow(), pickup_code=pickup_code,
+                updated_at=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount != 1:
+        db.session.rollback()
         return jsonify({
             'error': 'invalid_order_status',
             'message': 'Заказ должен быть в статусе PAID или IN_KITCHEN'
         }), 400
     
-    # Generate 6-digit pickup code if not already set
-    if not order.pickup_code:
-        order.pickup_code = f"{random.randint(0, 999999):06d}"
-    
-    # Update order status
-    order.status = 'READY'
-    order.ready_at = datetime.utcnow()
-    
     # Try to assign a locker cell (optional, best-effort)
     data = request.get_json(force=True, silent=True) or {}
-    cell_code_req = data.get('cell_code')
+    cell = allocate_cell(order, cell_code=data.get('cell_code'))
     cell_info = None
     
-    if cell_code_req:
-        cell = LockerCell.query.filter_by(
-            location_id=order.location_id,
-            code=cell_code_req
-        ).first()
-    else:
-        cell = LockerCell.query.filter_by(
-            location_id=order.location_id,
-            status='FREE'
-        ).first()
-    
-    if cell and cell.status == 'FREE':
+    if cell:
         hold_until = datetime.utcnow() + timedelta(minutes=60)
         
         location = Location.query.get(order.location_id)
@@ -255,18 +484,148 @@ def mark_ready(order_id):
             hold_until=hold_until
         )
         db.session.add(reservation)
-        cell.status = 'OCCUPIED'
         order.pickup_deadline_at = hold_until
         cell_info = cell.code
     
+    # Single-use QR token (stored hashed) + the PIN as its fallback
+    pickup_token = issue_pickup_token(order, pickup_code, cell_code=cell_info)
+    
     db.session.commit()
+    bus.publish_order(order, pickup_code=order.pickup_code, pickup_token=pickup_token,
+                      cell_code=cell_info)
     
     response = {
         'order_id': order.id,
         'status': 'READY',
-        'pickup_code': order.pickup_code
+        'pickup_code': order.pickup_code,
+        'pickup_token': pickup_token
     }
     if cell_info:
         response['cell_code'] = cell_info
     
     return jsonify(response)
+
+
+@bp.route('/orders/<order_id>/start', methods=['POST'])
+@jwt_required()
+def start_cooking(order_id):
+    """PAID -> IN_KITCHEN. The order keeps its place in the queue."""
+    claims = get_jwt()
+    if claims.get('role') not in ['cook', 'admin']:
+        return jsonify({'error': 'forbidden'}), 403
+    
+    order = Order.query.get(order_id)
+    if not order:
+        return jsonify({'error': 'order_not_found'}), 404
+    
+    result = db.session.execute(
+        update(Order)
+        .where(Order.id == order.id, Order.status == 'PAID')
+        .values(status='IN_KITCHEN', updated_at=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount != 1:
+        db.session.rollback()
+        return jsonify({
+            'error': 'invalid_order_status',
+            'message': 'Заказ должен быть в статусе PAID'
+        }), 400
+    
+    db.session.commit()
+    bus.publish_order(order)
+    return jsonify({'order_id': order.id, 'status': 'IN_KITCHEN'})
+
+
+@bp.route('/orders/<order_id>/bump', methods=['POST'])
+@jwt_required()
+def bump(order_id):
+    """Move a queued order KITCHEN_BUMP_MINUTES earlier (up to kitchen.PRIORITY_MAX bumps)."""
+    claims = get_jwt()
+    if claims.get('role') not in ['cook', 'admin']:
+        return jsonify({'error': 'forbidden'}), 403
+    
+    order = Order.query.get(order_id)
+    if not order:
+        return jsonify({'error': 'order_not_found'}), 404
+    
+    priority = order.priority or 0
+    if priority >= kitchen.PRIORITY_MAX:
+        return jsonify({'error': 'priority_max', 'message': 'Заказ уже в начале очереди'}), 400
+    cook_by = (order.cook_by or order.scheduled_for) - kitchen.bump_step()
+    
+    # Compare-and-set on the old priority: of two simultaneous bumps one gets 409
+    result = db.session.execute(
+        update(Order)
+        .where(Order.id == order.id, Order.status.in_(QUEUE_STATUSES),
+               func.coalesce(Order.priority, 0) == priority)
+        .values(priority=priority + 1, cook_by=cook_by, updated_at=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount != 1:
+        db.session.rollback()
+        return jsonify({
+            'error': 'invalid_order_status',
+            'message': 'Заказ уже не в очереди или его только что подняли'
+        }), 409
+    
+    db.session.commit()
+    bus.publish_order(order)
+    return jsonify({'order_id': order.id, 'priority': priority + 1, 'cook_by': cook_by.isoformat()})
+
+
+@bp.route('/cells/expired', methods=['GET'])
+@jwt_required()
+def expired_cells():
+    """Cells whose hold ran out with the order still inside (see app/sweeper.py)."""
+    claims = get_jwt()
+    if claims.get('role') not in ['cook', 'admin']:
+        return jsonify({'error': 'forbidden'}), 403
+    
+    query = db.session.query(
+        LockerCell.id, LockerCell.code, LockerReservation.order_id, LockerReservation.hold_until
+    ).join(LockerReservation, LockerReservation.cell_id == LockerCell.id).filter(
+        LockerCell.status == 'EXPIRED',
+        LockerReservation.released_at.is_(None)
+    )
+    if request.args.get('location_id'):
+        query = query.filter(LockerCell.location_id == request.args['location_id'])
+    
+    return jsonify({'cells': [{
+        'cell_id': row.id,
+        'cell_code': row.code,
+        'order_id': row.order_id,
+        'hold_until': row.hold_until.isoformat(),
+    } for row in query.order_by(LockerReservation.hold_until)]})
+
+
+@bp.route('/cells/<cell_id>/clear', methods=['POST'])
+@jwt_required()
+def clear_cell(cell_id):
+    """Staff emptied an EXPIRED cell: free it. The order stays READY for pickup at the counter."""
+    claims = get_jwt()
+    if claims.get('role') not in ['cook', 'admin']:
+        return jsonify({'error': 'forbidden'}), 403
+    
+    now = datetime.utcnow()
+    result = db.session.execute(
+        update(LockerCell)
+        .where(LockerCell.id == cell_id, LockerCell.status == 'EXPIRED')
+        .values(status='FREE')
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount != 1:
+        db.session.rollback()
+        return jsonify({
+            'error': 'invalid_cell_status',
+            'message': 'Ячейка не ожидает освобождения'
+        }), 400
+    
+    order_id = db.session.execute(
+        update(LockerReservation)
+        .where(LockerReservation.cell_id == cell_id, LockerReservation.released_at.is_(None))
+        .values(released_at=now)
+        .returning(LockerReservation.order_id)
+        .execution_options(synchronize_session=False)
+    ).scalar()
+    db.session.commit()
+    return jsonify({'cell_id': cell_id, 'status': 'FREE', 'order_id': order_id})
@@ -1,52 +1,23 @@
 """
-Menu routes - GET /menu, GET /catalog
+Menu routes - GET /menu, GET /menu/stock, GET /catalog, GET /menu/snapshots/{digest}
+Menu and catalog responses are precompressed snapshots (see app/menu_snapshots.py);
+stock counts change with every order and come from GET /menu/stock instead
 """
 from datetime import datetime, date as date_type
 from flask import Blueprint, request, jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity
-from app.models import MenuItem, Inventory, Location, User, DailyMenu, DailyMenuItem
+from flask_jwt_extended import jwt_required
+from app import db
+from app.current_user import current_user
+from app.localization import LANGUAGES, localized_name, request_language
+from app.menu_cache import menu_cache
+from app.menu_snapshots import menu_snapshots, IMMUTABLE, REQUEST_LEVELS
+from app.models import MenuItem, Inventory, Location, DailyMenu, DailyMenuItem
 
 bp = Blueprint('menu', __name__)
 
 
-@bp.route('/menu', methods=['GET'])
-@jwt_required()
-def get_menu():
-    user_id = get_jwt_identity()
-    user = User.query.get(user_id)
-    
-    if not user:
-        return jsonify({'error': 'user_not_found'}), 404
-    
-    # Determine location
-    location_id = request.args.get('location_id')
-    if location_id:
-        location = Location.query.get(location_id)
-    else:
-        location = Location.query.filter_by(org_id=user.org_id).first()
-    
-    if not location:
-        return jsonify({'error': 'location_not_found'}), 404
-    
-    if location.is_closed_manual:
-        return jsonify({
-            'error': 'location_closed',
-            'message': 'Столовая сейчас закрыта'
-        }), 403
-    
-    # Determine date
-    date_str = request.args.get('date')
-    if date_str:
-        try:
-            menu_date = date_type.fromisoformat(date_str)
-        except ValueError:
-            return jsonify({'error': 'invalid_date', 'message': 'Use YYYY-MM-DD'}), 400
-    else:
-        menu_date = date_type.today()
-    
-    meal_slot = request.args.get('meal_slot', 'lunch')
-    
-    # Look up DailyMenu
+def build_menu_payload(location, menu_date, meal_slot, lang):
+    """Serializable GET /menu body for one location/date/slot, names in `lang`. No stock counts."""
     daily_menu = DailyMenu.query.filter_by(
         location_id=location.id,
         menu_date=menu_date,
@@ -55,17 +26,16 @@ def get_menu():
     
     items = []
     if daily_menu:
-        for dmi in daily_menu.items:
-            item = dmi.menu_item
+        rows = db.session.query(DailyMenuItem, MenuItem, localized_name(MenuItem, lang)).join(
+            MenuItem, DailyMenuItem.menu_item_id == MenuItem.id
+        ).filter(DailyMenuItem.daily_menu_id == daily_menu.id)
+        for dmi, item, name in rows:
             items.append({
                 'id': item.id,
-                'name': item.name_ru,
-                'name_kz': item.name_kz,
-                'name_ru': item.name_ru,
+                'name': name,
                 'category': item.category,
                 'price': item.base_price,
                 'is_available': dmi.is_available,
-                'stock_qty': dmi.stock_qty,
                 'image_url': item.image_url,
                 'nutrition': {
                     'calories': item.calories_100g,
@@ -75,7 +45,7 @@ def get_menu():
                 }
             })
     
-    return jsonify({
+    return {
         'location': {
             'id': location.id,
             'name': location.name,
@@ -83,22 +53,15 @@ def get_menu():
         },
         'meal_slot': meal_slot,
         'date': menu_date.isoformat(),
+        'lang': lang,
         'has_daily_menu': daily_menu is not None,
         'items': items
-    })
+    }
 
 
-@bp.route('/catalog', methods=['GET'])
-@jwt_required()
-def get_catalog():
-    """Return all menu items from the org catalog (for cook daily-menu picker)."""
-    user_id = get_jwt_identity()
-    user = User.query.get(user_id)
-    
-    if not user:
-        return jsonify({'error': 'user_not_found'}), 404
-    
-    menu_items = MenuItem.query.filter_by(org_id=user.org_id).order_by(MenuItem.category, MenuItem.name_ru).all()
+def build_catalog_payload(org_id):
+    """Serializable GET /catalog body for one organization."""
+    menu_items = MenuItem.query.filter_by(org_id=org_id).order_by(MenuItem.category, MenuItem.name_ru).all()
     
     items = []
     for item in menu_items:
@@ -113,4 +76,125 @@ def get_catalog():
             'image_url': item.image_url
         })
     
-    return jsonify({'items': items})
+    return {'items': items}
+
+
+def publish_menu(location, menu_date, meal_slot):
+    """Precompile snapshots right after a daily menu is saved, before students ask."""
+    menu_cache.invalidate(location.id)
+    version = menu_cache.version(location.id)
+    for lang in LANGUAGES:
+        menu_cache.set((location.id, menu_date.isoformat(), meal_slot, lang),
+                       build_menu_payload(location, menu_date, meal_slot, lang), version)
+    
+    version = menu_cache.version(location.org_id)
+    menu_cache.set((location.org_id, 'catalog', ''), build_catalog_payload(location.org_id), version)
+    
+    menu_snapshots.prune()
+
+
+def _localized(response):
+    # Same URL, different body per language
+    response.vary.add('Accept-Language')
+    return response
+
+
+@bp.route('/menu', methods=['GET'])
+@jwt_required()
+def get_menu():
+    user = current_user()
+    
+    # Determine date
+    date_str = request.args.get('date')
+    if date_str:
+        try:
+            menu_date = date_type.fromisoformat(date_str)
+        except ValueError:
+            return jsonify({'error': 'invalid_date', 'message': 'Use YYYY-MM-DD'}), 400
+    else:
+        menu_date = date_type.today()
+    
+    meal_slot = request.args.get('meal_slot', 'lunch')
+    lang = request_language()
+    
+    # Determine location
+    location = None
+    location_id = request.args.get('location_id')
+    if not location_id:
+        location = Location.query.filter_by(org_id=user.org_id).first()
+        location_id = location.id if location else None
+    
+    # Served from memory until the menu or the location changes
+    cache_key = (location_id, menu_date.isoformat(), meal_slot, lang)
+    entry = menu_cache.get(cache_key)
+    if entry:
+        return _localized(menu_cache.response(entry))
+    version = menu_cache.version(location_id)
+    
+    if location is None and location_id:
+        location = Location.query.get(location_id)
+    
+    if not location:
+        return jsonify({'error': 'location_not_found'}), 404
+    
+    if location.is_closed_manual:
+        return jsonify({
+            'error': 'location_closed',
+            'message': 'Столовая сейчас закрыта'
+        }), 403
+    
+    payload = build_menu_payload(location, menu_date, meal_slot, lang)
+    entry = menu_cache.set(cache_key, payload, version, REQUEST_LEVELS)
+    return _localized(menu_cache.response(entry))
+
+
+@bp.route('/menu/stock', methods=['GET'])
+@jwt_required()
+def get_menu_stock():
+    """Portions left per dish of a daily menu: {menu_item_id: stock_qty (null = unlimited)}."""
+    user = current_user()
+    
+    date_str = request.args.get('date')
+    try:
+        menu_date = date_type.fromisoformat(date_str) if date_str else date_type.today()
+    except ValueError:
+        return jsonify({'error': 'invalid_date', 'message': 'Use YYYY-MM-DD'}), 400
+    meal_slot = request.args.get('meal_slot', 'lunch')
+    
+    location_id = request.args.get('location_id')
+    if not location_id:
+        location_id = db.session.query(Location.id).filter_by(org_id=user.org_id).limit(1).scalar()
+    
+    # One indexed query, no snapshot: this changes with every order
+    rows = db.session.query(DailyMenuItem.menu_item_id, DailyMenuItem.stock_qty).join(
+        DailyMenu, DailyMenuItem.daily_menu_id == DailyMenu.id
+    ).filter(
+        DailyMenu.location_id == location_id,
+        DailyMenu.menu_date == menu_date,
+        DailyMenu.meal_slot == meal_slot
+    )
+    response = jsonify({'stock': dict(rows.all())})
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+@bp.route('/catalog', methods=['GET'])
+@jwt_required()
+def get_catalog():
+    """Return all menu items from the org catalog (for cook daily-menu picker)."""
+    user = current_user()
+    
+    cache_key = (user.org_id, 'catalog', '')
+    entry = menu_cache.get(cache_key)
+    if not entry:
+        version = menu_cache.version(user.org_id)
+        entry = menu_cache.set(cache_key, build_catalog_payload(user.org_id), version, REQUEST_LEVELS)
+    return menu_cache.response(entry)
+
+
+@bp.route('/menu/snapshots/<digest>', methods=['GET'])
+def get_snapshot(digest):
+    """Immutable menu/catalog snapshot by content hash (safe for CDNs and browser caches)."""
+    if not menu_snapshots.exists(digest):
+        return jsonify({'error': 'snapshot_not_found'}), 404
+    return menu_snapshots.response(digest, cache_control=IMMUTABLE)
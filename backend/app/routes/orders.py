@@ -1,20 +1,54 @@
 """
-Orders routes - POST /orders, POST /payments/fake, GET /orders/{id}, GET /orders/my
+Orders routes - POST /orders, POST /payments/fake, GET /orders/{id},
+                GET /orders/my (?cursor=, ?fields=), POST /orders/{id}/cancel
 """
 from flask import Blueprint, request, jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity
-from datetime import datetime, timedelta
-from app import db
-from app.models import Order, OrderItem, MenuItem, Inventory, Receipt, User, Location
+from flask_jwt_extended import jwt_required, get_jwt, get_jwt_identity
+from datetime import datetime, timedelta, timezone, date as date_type
+from sqlalchemy import insert, tuple_, update
+from app import db, idempotency, kitchen
+from app.current_user import current_user
+from app.cursors import encode_cursor, parse_cursor
+from app.localization import localized_name, pick_name, request_language
+from app.models import (
+    Order, OrderItem, MenuItem, Inventory, Receipt, Location, DailyMenu,
+    LockerReservation, LockerCell, generate_uuid
+)
+from app.events import bus
+from app.slots import MAX_AHEAD, SlotFull, availability, book_slot, slot_length
+from app.stock import reserve_stock, cancel_order, OutOfStock, HOLDING_STATUSES
 
 bp = Blueprint('orders', __name__)
 
+HISTORY_PAGE_SIZE = 20
+HISTORY_MAX_PAGE_SIZE = 100
+HISTORY_FIELDS = ('id', 'status', 'total', 'scheduled_for', 'created_at', 'items',
+                  'pickup_code', 'cell_code', 'receipt')
+HISTORY_DEFAULT_FIELDS = {'id', 'status', 'total', 'scheduled_for', 'created_at', 'items',
+                          'pickup_code'}
+
 
 @bp.route('/orders', methods=['POST'])
 @jwt_required()
 def create_order():
-    user_id = get_jwt_identity()
-    user = User.query.get(user_id)
+    """
+    Place an order. Send an Idempotency-Key header to make re-taps safe:
+    repeats get the first order back instead of creating another one.
+    A full pickup slot moves the order to a later one unless exact_slot is set.
+    """
+    user = current_user()
+    user_id = user.id
+    lang = request_language()
+    try:
+        key = idempotency.request_key()
+    except ValueError:
+        return jsonify({'error': 'invalid_idempotency_key'}), 400
+    record = None
+    if key:
+        record, replay = idempotency.claim(user_id, key)
+        if replay:
+            return replay
+    
     data = request.get_json()
     
     if not data or 'items' not in data or not data['items']:
@@ -28,48 +62,52 @@ def create_order():
     # Parse scheduled_for or default to now + 1h
     scheduled_for = data.get('scheduled_for')
     if scheduled_for:
-        scheduled_for = datetime.fromisoformat(scheduled_for.replace('Z', '+00:00'))
+        try:
+            scheduled_for = datetime.fromisoformat(scheduled_for.replace('Z', '+00:00'))
+        except ValueError:
+            return jsonify({'error': 'scheduled_time_invalid', 'message': 'Неверный формат времени'}), 400
+        if scheduled_for.tzinfo:
+            scheduled_for = scheduled_for.astimezone(timezone.utc).replace(tzinfo=None)
     else:
         scheduled_for = datetime.utcnow() + timedelta(hours=1)
     
     # Validate: max +3 hours
-    if scheduled_for > datetime.utcnow() + timedelta(hours=3):
+    if scheduled_for > datetime.utcnow() + MAX_AHEAD:
         return jsonify({
             'error': 'scheduled_time_invalid',
             'message': 'Время должно быть не более +3 часов'
         }), 400
     
-    # Create order
-    order = Order(
-        user_id=user_id,
-        location_id=location.id,
-        status='CREATED',
-        scheduled_for=scheduled_for,
-        total=0
-    )
-    db.session.add(order)
+    # Resolve every cart line in one query per table instead of two per line
+    menu_item_ids = {item_data['menu_item_id'] for item_data in data['items']}
+    menu_items = {
+        mi.id: mi for mi in MenuItem.query.filter(MenuItem.id.in_(menu_item_ids))
+    }
+    inventory = {
+        inv.menu_item_id: inv for inv in Inventory.query.filter(
+            Inventory.location_id == location.id,
+            Inventory.menu_item_id.in_(menu_item_ids)
+        )
+    }
     
-    # Add items
+    # Validate items and build rows
     total = 0
+    order_id = generate_uuid()
+    quantities = {}
+    order_item_rows = []
     order_items_response = []
     
     for item_data in data['items']:
-        menu_item = MenuItem.query.get(item_data['menu_item_id'])
+        menu_item = menu_items.get(item_data['menu_item_id'])
         if not menu_item:
-            db.session.rollback()
             return jsonify({
                 'error': 'item_not_found',
                 'message': f"Блюдо {item_data['menu_item_id']} не найдено"
             }), 400
         
         # Check availability
-        inv = Inventory.query.filter_by(
-            location_id=location.id,
-            menu_item_id=menu_item.id
-        ).first()
-        
+        inv = inventory.get(menu_item.id)
         if not inv or not inv.is_available:
-            db.session.rollback()
             return jsonify({
                 'error': 'item_unavailable',
                 'message': f"Блюдо '{menu_item.name_ru}' недоступно",
@@ -77,93 +115,197 @@ def create_order():
             }), 400
         
         qty = item_data.get('qty', 1)
+        if not isinstance(qty, int) or isinstance(qty, bool) or qty < 1:
+            return jsonify({
+                'error': 'invalid_qty',
+                'message': 'qty должно быть положительным целым числом',
+                'item_id': menu_item.id
+            }), 400
+        quantities[menu_item.id] = quantities.get(menu_item.id, 0) + qty
         subtotal = menu_item.base_price * qty
         total += subtotal
         
-        order_item = OrderItem(
-            order_id=order.id,
-            menu_item_id=menu_item.id,
-            qty=qty,
-            unit_price=menu_item.base_price,
-            comment=item_data.get('comment')
-        )
-        db.session.add(order_item)
+        order_item_rows.append({
+            'order_id': order_id,
+            'menu_item_id': menu_item.id,
+            'qty': qty,
+            'unit_price': menu_item.base_price,
+            'name_kz': menu_item.name_kz,
+            'name_ru': menu_item.name_ru,
+            'name_en': menu_item.name_en,
+            'category': menu_item.category,
+            'comment': item_data.get('comment')
+        })
         
         order_items_response.append({
             'menu_item_id': menu_item.id,
-            'name': menu_item.name_ru,
+            'name': pick_name(menu_item, lang),
             'qty': qty,
             'unit_price': menu_item.base_price,
             'subtotal': subtotal
         })
     
-    order.total = total
-    db.session.commit()
+    # Daily menu the order draws its portions from (if one is published)
+    daily_menu = DailyMenu.query.filter_by(
+        location_id=location.id,
+        menu_date=date_type.today(),
+        meal_slot=data.get('meal_slot', 'lunch')
+    ).first()
+    daily_menu_id = daily_menu.id if daily_menu else None
     
-    return jsonify({
+    # Reserve stock atomically; any shortage rolls back the whole order
+    try:
+        reserve_stock(location.id, daily_menu_id, quantities)
+    except OutOfStock as e:
+        db.session.rollback()
+        return jsonify({
+            'error': 'out_of_stock',
+            'message': f"Блюдо '{menu_items[e.menu_item_id].name_ru}' закончилось",
+            'item_id': e.menu_item_id
+        }), 409
+    
+    # Book a place in the pickup slot (or a later one); same transaction as the stock
+    try:
+        scheduled_for = book_slot(location, scheduled_for, shift=not data.get('exact_slot'))
+    except SlotFull as e:
+        db.session.rollback()
+        return jsonify({
+            'error': 'slot_full',
+            'message': 'На это время заказов больше не принимаем',
+            'next_available': e.next_available.isoformat() if e.next_available else None
+        }), 409
+    
+    # Create order, then all of its lines in a single executemany INSERT
+    now = datetime.utcnow()
+    order = Order(
+        id=order_id,
+        user_id=user_id,
+        location_id=location.id,
+        daily_menu_id=daily_menu_id,
+        stock_reserved=True,
+        status='CREATED',
+        scheduled_for=scheduled_for,
+        total=total,
+        created_at=now,
+        cook_by=kitchen.cook_by(scheduled_for, now, kitchen.prep_minutes(menu_items.values()))
+    )
+    db.session.add(order)
+    db.session.flush()
+    db.session.execute(insert(OrderItem), order_item_rows)
+    
+    body = {
         'order_id': order.id,
         'status': order.status,
         'total': total,
         'scheduled_for': order.scheduled_for.isoformat(),
         'items': order_items_response,
         'created_at': order.created_at.isoformat()
-    }), 201
+    }
+    idempotency.complete(record, 201, body)
+    db.session.commit()
+    
+    return jsonify(body), 201
+
+
+@bp.route('/slots', methods=['GET'])
+@jwt_required()
+def get_slots():
+    """Pickup slots from now to +3h with free places. Query: location_id"""
+    user = current_user()
+    query = Location.query.filter_by(org_id=user.org_id)
+    if request.args.get('location_id'):
+        query = query.filter_by(id=request.args['location_id'])
+    location = query.first()
+    if not location:
+        return jsonify({'error': 'location_not_found'}), 404
+    
+    return jsonify({
+        'location_id': location.id,
+        'slot_minutes': int(slot_length().total_seconds() // 60),
+        'slots': [{**slot, 'starts_at': slot['starts_at'].isoformat()}
+                  for slot in availability(location)]
+    })
 
 
 @bp.route('/payments/fake', methods=['POST'])
 @jwt_required()
 def fake_payment():
+    """
+    Pay for a CREATED order. Safe to retry with an Idempotency-Key header:
+    the retry gets the first receipt back instead of an error.
+    """
+    user = current_user()
+    try:
+        key = idempotency.request_key()
+    except ValueError:
+        return jsonify({'error': 'invalid_idempotency_key'}), 400
+    record = None
+    if key:
+        record, replay = idempotency.claim(user.id, key)
+        if replay:
+            return replay
+    
     data = request.get_json()
     
     if not data or 'order_id' not in data:
         return jsonify({'error': 'missing_order_id'}), 400
     
-    order = Order.query.get(data['order_id'])
-    if not order:
-        return jsonify({'error': 'order_not_found'}), 404
-    
-    if order.status != 'CREATED':
+    # Compare-and-set: of two racing taps exactly one moves CREATED -> PAID
+    now = datetime.utcnow()
+    order = db.session.execute(
+        update(Order)
+        .where(Order.id == data['order_id'], Order.user_id == user.id, Order.status == 'CREATED')
+        .values(status='PAID', updated_at=now)
+        .returning(Order.id, Order.user_id, Order.location_id, Order.status,
+                   Order.total, Order.updated_at)
+        .execution_options(synchronize_session=False)
+    ).one_or_none()
+    if order is None:
+        db.session.rollback()
+        if not db.session.query(Order.id).filter_by(id=data['order_id'], user_id=user.id).first():
+            return jsonify({'error': 'order_not_found'}), 404
         return jsonify({
             'error': 'invalid_order_status',
             'message': 'Заказ уже оплачен или отменён'
         }), 400
     
-    # Update status
-    order.status = 'PAID'
-    
-    # Create receipt
-    items_data = []
-    for item in order.items:
-        items_data.append({
-            'name': item.menu_item.name_ru,
-            'qty': item.qty,
-            'unit_price': item.unit_price,
-            'subtotal': item.qty * item.unit_price
-        })
+    # Receipt lines from the order's own snapshot, one query
+    lines = db.session.query(
+        localized_name(OrderItem, request_language()), OrderItem.qty, OrderItem.unit_price
+    ).filter(OrderItem.order_id == order.id)
+    items_data = [{
+        'name': name,
+        'qty': qty,
+        'unit_price': unit_price,
+        'subtotal': qty * unit_price
+    } for name, qty, unit_price in lines]
     
     receipt = Receipt(
+        id=generate_uuid(),
         order_id=order.id,
         receipt_data={
             'items': items_data,
             'total': order.total,
-            'paid_at': datetime.utcnow().isoformat()
+            'paid_at': now.isoformat()
         }
     )
     db.session.add(receipt)
-    db.session.commit()
     
-    return jsonify({
+    body = {
         'success': True,
         'order_id': order.id,
         'status': 'PAID',
         'receipt': {
             'id': receipt.id,
             'order_id': order.id,
-            'items': items_data,
-            'total': order.total,
-            'paid_at': receipt.receipt_data['paid_at']
+            **receipt.receipt_data
         }
-    })
+    }
+    idempotency.complete(record, 200, body)
+    db.session.commit()
+    bus.publish_order(order)
+    
+    return jsonify(body)
 
 
 @bp.route('/orders/<order_id>', methods=['GET'])
@@ -173,13 +315,14 @@ def get_order(order_id):
     if not order:
         return jsonify({'error': 'order_not_found'}), 404
     
+    lang = request_language()
     response = {
         'id': order.id,
         'status': order.status,
         'scheduled_for': order.scheduled_for.isoformat(),
         'total': order.total,
         'items': [{
-            'name': item.menu_item.name_ru,
+            'name': pick_name(item, lang),
             'qty': item.qty,
             'unit_price': item.unit_price
         } for item in order.items],
@@ -204,30 +347,120 @@ def get_order(order_id):
 @bp.route('/orders/my', methods=['GET'])
 @jwt_required()
 def get_my_orders():
-    """Get all orders for the current user."""
+    """
+    Current user's orders, newest first. Query: limit, cursor (next_cursor
+    of the previous page), fields (comma-separated subset of HISTORY_FIELDS).
+    """
     user_id = get_jwt_identity()
+    limit = min(max(request.args.get('limit', HISTORY_PAGE_SIZE, type=int), 1), HISTORY_MAX_PAGE_SIZE)
+    
+    fields = HISTORY_DEFAULT_FIELDS
+    if request.args.get('fields'):
+        fields = set(request.args['fields'].split(',')) & set(HISTORY_FIELDS)
+        fields.add('id')
+    
+    query = db.session.query(
+        Order.id, Order.status, Order.total, Order.scheduled_for, Order.created_at,
+        Order.pickup_code
+    ).filter(Order.user_id == user_id)
+    
+    # Keyset pagination on (created_at, id) — same cost on page 1 and page 100
+    cursor = request.args.get('cursor')
+    if cursor:
+        try:
+            before_ts, before_id = parse_cursor(cursor)
+        except ValueError:
+            return jsonify({'error': 'invalid_cursor'}), 400
+        query = query.filter(tuple_(Order.created_at, Order.id) < tuple_(before_ts, before_id))
+    
+    rows = query.order_by(Order.created_at.desc(), Order.id.desc()).limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    order_ids = [row.id for row in rows]
+    
+    # One query per requested relation for the whole page, never per order
+    items_by_order = {}
+    if 'items' in fields and order_ids:
+        lines = db.session.query(
+            OrderItem.order_id, localized_name(OrderItem, request_language()),
+            OrderItem.qty, OrderItem.unit_price
+        ).filter(OrderItem.order_id.in_(order_ids))
+        for order_id, name, qty, unit_price in lines:
+            items_by_order.setdefault(order_id, []).append(
+                {'name': name, 'qty': qty, 'unit_price': unit_price})
+    
+    receipts = {}
+    if 'receipt' in fields and order_ids:
+        receipts = dict(db.session.query(Receipt.order_id, Receipt.receipt_data).filter(
+            Receipt.order_id.in_(order_ids)))
     
-    orders = Order.query.filter_by(user_id=user_id).order_by(Order.created_at.desc()).limit(20).all()
+    cells = {}
+    if 'cell_code' in fields and order_ids:
+        cells = dict(db.session.query(LockerReservation.order_id, LockerCell.code).join(
+            LockerCell, LockerReservation.cell_id == LockerCell.id
+        ).filter(
+            LockerReservation.order_id.in_(order_ids),
+            LockerReservation.released_at.is_(None)
+        ))
     
     result = []
-    for order in orders:
+    for row in rows:
         entry = {
-            'id': order.id,
-            'status': order.status,
-            'total': order.total,
-            'scheduled_for': order.scheduled_for.isoformat(),
-            'created_at': order.created_at.isoformat(),
-            'items': [{
-                'name': item.menu_item.name_ru,
-                'qty': item.qty,
-                'unit_price': item.unit_price
-            } for item in order.items]
+            'id': row.id,
+            'status': row.status,
+            'total': row.total,
+            'scheduled_for': row.scheduled_for.isoformat(),
+            'created_at': row.created_at.isoformat(),
+            'items': items_by_order.get(row.id, []),
+            'receipt': receipts.get(row.id),
+            'cell_code': cells.get(row.id),
         }
+        entry = {key: value for key, value in entry.items() if key in fields}
         
         # Show pickup_code only when order is READY
-        if order.status == 'READY' and order.pickup_code:
-            entry['pickup_code'] = order.pickup_code
+        if 'pickup_code' in fields and row.status == 'READY' and row.pickup_code:
+            entry['pickup_code'] = row.pickup_code
         
         result.append(entry)
     
-    return jsonify({'orders': result})
+    next_cursor = None
+    if has_more:
+        next_cursor = encode_cursor(rows[-1].created_at, rows[-1].id)
+    
+    return jsonify({'orders': result, 'next_cursor': next_cursor})
+
+
+@bp.route('/orders/<order_id>/cancel', methods=['POST'])
+@jwt_required()
+def cancel(order_id):
+    """Cancel an order and return its portions to stock."""
+    claims = get_jwt()
+    user_id = get_jwt_identity()
+    
+    order = Order.query.get(order_id)
+    if not order:
+        return jsonify({'error': 'order_not_found'}), 404
+    
+    # Students may cancel their own unpaid orders; cooks/admins anything not READY yet
+    if claims.get('role') in ['cook', 'admin']:
+        from_statuses = HOLDING_STATUSES
+    elif order.user_id == user_id:
+        from_statuses = ('CREATED',)
+    else:
+        return jsonify({'error': 'forbidden'}), 403
+    
+    if not cancel_order(order, from_statuses=from_statuses):
+        db.session.rollback()
+        return jsonify({
+            'error': 'invalid_order_status',
+            'message': 'Заказ уже нельзя отменить'
+        }), 400
+    
+    db.session.commit()
+    bus.publish_order(order)
+    
+    return jsonify({
+        'success': True,
+        'order_id': order.id,
+        'status': 'CANCELLED'
+    })
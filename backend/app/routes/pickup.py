@@ -1,74 +1,132 @@
 """
-Pickup routes - POST /pickup/claim
-MVP: claim order by order_id + pickup_code
+Pickup routes - POST /pickup/claim, POST /pickup/claims:batch
+Claim a READY order with its QR token ({token}) or with order_id + pickup_code.
+Both are single-use PickupTokens; PIN guesses are rate limited per IP and per order.
+Kiosks that verified signed tokens offline sync them in one batch.
 """
-from flask import Blueprint, request, jsonify
-from datetime import datetime
+import hmac
+from flask import Blueprint, request, jsonify, current_app
+from datetime import datetime, timezone
+from flask_jwt_extended import jwt_required, get_jwt
+from sqlalchemy import update, case
 from app import db
-from app.models import Order, LockerReservation
+from app.events import bus
+from app.models import Order, PickupToken, LockerReservation, LockerCell
+from app.pickup_tokens import hash_token, pin_digest, use_token, verify_signed_token
+from app.rate_limit import SlidingWindowLimiter, too_many_attempts
 
 bp = Blueprint('pickup', __name__)
 
+# A kiosk serves a queue of people, so the per-IP budget is generous; a
+# 6-digit PIN gets a handful of tries per order before it locks for a while
+ip_limiter = SlidingWindowLimiter(limit=30, window=60)
+order_limiter = SlidingWindowLimiter(limit=5, window=900)
+
+MAX_BATCH_CLAIMS = 200
+
+
+def _already_picked_up(order):
+    return jsonify({
+        'success': True,
+        'order_id': order.id,
+        'message': 'Заказ уже получен'
+    }), 200
+
 
 @bp.route('/pickup/claim', methods=['POST'])
 def claim():
-    data = request.get_json()
+    data = request.get_json(silent=True)
     
     if not data:
         return jsonify({'error': 'invalid_request'}), 400
     
+    token = data.get('token')
     order_id = data.get('order_id')
     pickup_code = data.get('pickup_code')
     
-    if not order_id or not pickup_code:
+    if not token and not (order_id and pickup_code):
         return jsonify({
             'error': 'missing_fields',
-            'message': 'order_id и pickup_code обязательны'
+            'message': 'token или order_id и pickup_code обязательны'
         }), 400
     
-    # Find order
-    order = Order.query.get(order_id)
-    if not order:
-        return jsonify({
-            'error': 'order_not_found',
-            'message': 'Заказ не найден'
-        }), 404
+    # Rate limits first: rejected guesses never touch the database
+    retry_after = ip_limiter.hit(request.remote_addr)
+    if not retry_after and not token:
+        retry_after = order_limiter.hit(order_id)
+    if retry_after:
+        return too_many_attempts(retry_after)
     
-    # Already picked up (idempotent)
-    if order.status == 'PICKED_UP':
-        return jsonify({
-            'success': True,
-            'order_id': order.id,
-            'message': 'Заказ уже получен'
-        }), 200
+    if token:
+        # QR: one UPDATE on the unique qr_token index marks it used
+        token_hash = hash_token(token)
+        claimed_id = use_token(PickupToken.qr_token == token_hash)
+        if not claimed_id:
+            db.session.rollback()
+            known_id = db.session.query(PickupToken.order_id).filter_by(qr_token=token_hash).scalar()
+            order = Order.query.get(known_id) if known_id else None
+            # Already picked up (idempotent)
+            if order and order.status == 'PICKED_UP':
+                return _already_picked_up(order)
+            return jsonify({
+                'error': 'invalid_pickup_token',
+                'message': 'QR-код недействителен или истёк'
+            }), 400
+        order = Order.query.get(claimed_id)
+    else:
+        order = Order.query.get(order_id)
+        if not order:
+            return jsonify({
+                'error': 'order_not_found',
+                'message': 'Заказ не найден'
+            }), 404
+        
+        # Already picked up (idempotent)
+        if order.status == 'PICKED_UP':
+            return _already_picked_up(order)
+        
+        # Verify pickup code
+        claimed_id = use_token((PickupToken.order_id == order.id)
+                               & (PickupToken.pin_code == pin_digest(order.id, pickup_code)))
+        if not claimed_id and order.tokens.filter(PickupToken.pin_code != '').first() is None:
+            # Orders marked READY before pickup tokens (or hashed PINs) existed
+            if order.pickup_code and hmac.compare_digest(order.pickup_code, str(pickup_code)):
+                claimed_id = order.id
+        if not claimed_id:
+            db.session.rollback()
+            return jsonify({
+                'error': 'invalid_pickup_code',
+                'message': 'Неверный код выдачи'
+            }), 400
     
-    # Must be READY
-    if order.status != 'READY':
+    # Must be READY; compare-and-set so two kiosks can't both hand it out
+    now = datetime.utcnow()
+    result = db.session.execute(
+        update(Order)
+        .where(Order.id == order.id, Order.status == 'READY')
+        .values(status='PICKED_UP', picked_up_at=now, updated_at=now)
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount != 1:
+        db.session.rollback()
+        if order.status == 'PICKED_UP':
+            return _already_picked_up(order)
         return jsonify({
             'error': 'order_not_ready',
             'message': f'Заказ в статусе {order.status}, ожидается READY'
         }), 400
     
-    # Verify pickup code
-    if order.pickup_code != pickup_code:
-        return jsonify({
-            'error': 'invalid_pickup_code',
-            'message': 'Неверный код выдачи'
-        }), 400
-    
-    # All checks passed - claim the order
-    order.status = 'PICKED_UP'
-    order.picked_up_at = datetime.utcnow()
-    
     # Release locker cell if reserved
-    reservation = LockerReservation.query.filter_by(order_id=order.id).first()
+    reservation = order.reservation
     cell_code = None
     if reservation and not reservation.released_at:
-        reservation.released_at = datetime.utcnow()
+        reservation.released_at = now
         reservation.cell.status = 'FREE'
         cell_code = reservation.cell.code
     
     db.session.commit()
+    order_limiter.reset(order.id)
+    bus.publish_order(order, cell_code=cell_code)
     
     return jsonify({
         'success': True,
@@ -76,3 +134,152 @@ def claim():
         'message': 'Заказ выдан успешно!',
         'cell_code': cell_code
     })
+
+
+@bp.route('/pickup/claims:batch', methods=['POST'])
+@jwt_required()
+def claim_batch():
+    """
+    Sync claims a kiosk accepted offline: {claims: [{token, claimed_at}]}.
+    Every claim and cell release commits in one transaction. Results come
+    back one per entry, in order, with its index: claimed / already_claimed /
+    invalid / not_ready.
+    """
+    claims = get_jwt()
+    if claims.get('role') not in ['cook', 'admin']:
+        return jsonify({'error': 'forbidden'}), 403
+    
+    key = current_app.config['KIOSK_SIGNING_KEY']
+    if not key:
+        return jsonify({
+            'error': 'kiosk_mode_disabled',
+            'message': 'KIOSK_SIGNING_KEY не настроен'
+        }), 503
+    
+    data = request.get_json(silent=True) or {}
+    entries = data.get('claims')
+    if not isinstance(entries, list) or not entries:
+        return jsonify({'error': 'invalid_request', 'message': 'claims обязателен'}), 400
+    if len(entries) > MAX_BATCH_CLAIMS:
+        return jsonify({
+            'error': 'batch_too_large',
+            'message': f'Не более {MAX_BATCH_CLAIMS} выдач за раз'
+        }), 400
+    
+    now = datetime.utcnow()
+    results = []  # one per entry, in input order
+    hashes = {}  # index -> token hash, for entries with a valid signature
+    claimed_at = {}  # token hash -> when the kiosk handed it out (first entry wins)
+    for i, entry in enumerate(entries):
+        result = {'index': i, 'order_id': None, 'status': 'invalid'}
+        results.append(result)
+        token = entry.get('token') if isinstance(entry, dict) else None
+        if not isinstance(token, str):
+            continue
+        try:
+            at = datetime.fromisoformat(entry['claimed_at']) if entry.get('claimed_at') else now
+        except (TypeError, ValueError):
+            continue
+        if at.tzinfo:
+            # JS toISOString() sends ...Z
+            at = at.astimezone(timezone.utc).replace(tzinfo=None)
+        at = min(at, now)
+        # The kiosk checked expiry when it opened the cell, so check against that moment
+        payload = verify_signed_token(token, key, now=(at - datetime(1970, 1, 1)).total_seconds())
+        if not payload:
+            continue
+        result['order_id'] = payload.get('o')
+        token_hash = hash_token(token)
+        hashes[i] = token_hash
+        claimed_at.setdefault(token_hash, at)
+    
+    # 1. Use every still-unused token in one UPDATE
+    used = dict(db.session.execute(
+        update(PickupToken)
+        .where(PickupToken.qr_token.in_(list(claimed_at)), PickupToken.used_at.is_(None))
+        .values(used_at=now)
+        .returning(PickupToken.qr_token, PickupToken.order_id)
+        .execution_options(synchronize_session=False)
+    ).all()) if claimed_at else {}
+    
+    # 2. READY -> PICKED_UP for their orders, keeping the kiosk's timestamps
+    picked = set()
+    if used:
+        picked_up_at = {order_id: claimed_at[token_hash] for token_hash, order_id in used.items()}
+        picked = set(db.session.execute(
+            update(Order)
+            .where(Order.id.in_(list(picked_up_at)), Order.status == 'READY')
+            .values(status='PICKED_UP', updated_at=now,
+                    picked_up_at=case(picked_up_at, value=Order.id, else_=now))
+            .returning(Order.id)
+            .execution_options(synchronize_session=False)
+        ).scalars())
+        
+        # Tokens of orders that weren't READY (cancelled meanwhile) stay unused
+        unused = [token_hash for token_hash, order_id in used.items() if order_id not in picked]
+        if unused:
+            db.session.execute(
+                update(PickupToken)
+                .where(PickupToken.qr_token.in_(unused))
+                .values(used_at=None)
+                .execution_options(synchronize_session=False)
+            )
+    
+    # 3. Free their locker cells
+    cell_codes = {}
+    if picked:
+        released = db.session.execute(
+            update(LockerReservation)
+            .where(LockerReservation.order_id.in_(list(picked)), LockerReservation.released_at.is_(None))
+            .values(released_at=now)
+            .returning(LockerReservation.order_id, LockerReservation.cell_id)
+            .execution_options(synchronize_session=False)
+        ).all()
+        if released:
+            cells = dict(db.session.execute(
+                update(LockerCell)
+                .where(LockerCell.id.in_([cell_id for _, cell_id in released]),
+                       LockerCell.status.in_(('OCCUPIED', 'EXPIRED')))
+                .values(status='FREE')
+                .returning(LockerCell.id, LockerCell.code)
+                .execution_options(synchronize_session=False)
+            ).all())
+            cell_codes = {order_id: cells.get(cell_id) for order_id, cell_id in released}
+    
+    db.session.commit()
+    
+    # Everything not claimed now: already picked up, not claimable, or unknown
+    pending = [token_hash for token_hash in claimed_at
+               if used.get(token_hash) not in picked]
+    known = {}
+    if pending:
+        known = {token_hash: (used_at, status) for token_hash, used_at, status in db.session.query(
+            PickupToken.qr_token, PickupToken.used_at, Order.status
+        ).join(Order, PickupToken.order_id == Order.id).filter(PickupToken.qr_token.in_(pending))}
+    first = {}  # token hash -> result of its first entry
+    for i, token_hash in hashes.items():
+        result = results[i]
+        if token_hash in first:
+            # Same token twice in one batch: only its first entry can claim
+            status = first[token_hash]['status']
+            result['status'] = 'already_claimed' if status == 'claimed' else status
+            continue
+        first[token_hash] = result
+        if used.get(token_hash) in picked:
+            result['status'] = 'claimed'
+            result['cell_code'] = cell_codes.get(used[token_hash])
+        elif token_hash not in known:
+            result['status'] = 'invalid'
+        else:
+            used_at, status = known[token_hash]
+            result['status'] = (
+                'already_claimed' if used_at and status == 'PICKED_UP' else 'not_ready')
+    
+    if picked:
+        for order in Order.query.filter(Order.id.in_(list(picked))):
+            bus.publish_order(order, cell_code=cell_codes.get(order.id))
+    
+    return jsonify({
+        'claimed': len(picked),
+        'results': results
+    })
@@ -0,0 +1,89 @@
+"""
+Stream routes - GET /stream/orders (Server-Sent Events)
+EventSource can't send headers, so the JWT may also come as ?jwt=<token>
+
+Every open stream holds one gunicorn thread. A worker serves at most
+STREAM_MAX_PER_WORKER of them, so the rest of its threads stay free for the
+API; past that the stream is refused with 503 and clients poll instead.
+"""
+import json
+import threading
+import time
+from flask import Blueprint, Response, current_app, jsonify, stream_with_context
+from flask_jwt_extended import jwt_required, get_jwt, get_jwt_identity
+from app.current_user import current_user
+from app.events import bus
+from app.models import Location
+
+bp = Blueprint('stream', __name__)
+
+KEEPALIVE_SECONDS = 15
+# Close long streams so gunicorn threads get recycled; EventSource reconnects
+MAX_STREAM_SECONDS = 300
+# Seconds a refused client waits before polling / trying again
+FULL_RETRY_AFTER = 30
+
+
+class StreamSlots:
+    """Count of open streams in this worker process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.open = 0
+
+    def acquire(self, limit):
+        with self._lock:
+            if self.open >= limit:
+                return False
+            self.open += 1
+            return True
+
+    def release(self):
+        with self._lock:
+            self.open -= 1
+
+
+slots = StreamSlots()
+
+
+@bp.route('/orders', methods=['GET'])
+@jwt_required(locations=['headers', 'query_string'])
+def stream_orders():
+    """Push order status changes: own orders for students, location queue for cooks."""
+    claims = get_jwt()
+    user_id = get_jwt_identity()
+    
+    channels = [f'user:{user_id}']
+    if claims.get('role') in ['cook', 'admin']:
+        channels += [f'location:{loc_id}' for (loc_id,) in
+                     Location.query.with_entities(Location.id).filter_by(org_id=current_user().org_id)]
+    
+    if not slots.acquire(current_app.config['STREAM_MAX_PER_WORKER']):
+        response = jsonify({'error': 'stream_full', 'message': 'Слишком много подключений, попробуйте позже'})
+        response.status_code = 503
+        response.headers['Retry-After'] = str(FULL_RETRY_AFTER)
+        return response
+    
+    sub = bus.subscribe(channels)
+    
+    def generate():
+        yield "retry: 3000\n\n"
+        deadline = time.monotonic() + MAX_STREAM_SECONDS
+        while time.monotonic() < deadline:
+            event = sub.get(timeout=KEEPALIVE_SECONDS)
+            if event is None:
+                yield ": keepalive\n\n"
+            else:
+                yield f"event: order\ndata: {json.dumps(event)}\n\n"
+    
+    def close():
+        bus.unsubscribe(sub)
+        slots.release()
+    
+    response = Response(stream_with_context(generate()), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+    # Runs when the server closes the response, even if the generator never started
+    response.call_on_close(close)
+    return response
@@ -0,0 +1,121 @@
+"""
+Schema management - one-shot migrations/seed and a cheap startup check
+
+setup_database() is the only place that runs DDL (`flask setup-db`, run once
+per deploy). Workers call check_schema_revision() on boot, which compares the
+migrations head with a revision cached in the instance folder, so a normal
+boot sends no queries at all.
+"""
+import hashlib
+import os
+from alembic.script import ScriptDirectory
+from flask_migrate import upgrade, stamp
+from sqlalchemy import inspect, text
+from app import db, migrate
+
+BASELINE_REVISION = '0001'
+
+# Columns the pre-migrations startup block used to ALTER into old databases
+LEGACY_COLUMNS = [
+    "ALTER TABLE orders ADD COLUMN IF NOT EXISTS pickup_code VARCHAR(6)",
+    "ALTER TABLE orders ADD COLUMN IF NOT EXISTS ready_at TIMESTAMP",
+    "ALTER TABLE orders ADD COLUMN IF NOT EXISTS picked_up_at TIMESTAMP",
+    "ALTER TABLE orders ADD COLUMN IF NOT EXISTS daily_menu_id VARCHAR(36) REFERENCES daily_menus(id)",
+    "ALTER TABLE users ADD COLUMN IF NOT EXISTS group_id VARCHAR(36) REFERENCES groups(id)",
+]
+
+LEGACY_GROUPS_TABLE = """
+    CREATE TABLE IF NOT EXISTS groups (
+        id VARCHAR(36) PRIMARY KEY,
+        org_id VARCHAR(36) NOT NULL REFERENCES organizations(id),
+        name VARCHAR(100) NOT NULL,
+        type VARCHAR(20) NOT NULL,
+        created_at TIMESTAMP DEFAULT NOW(),
+        CONSTRAINT uq_group_org_name UNIQUE (org_id, name)
+    )
+"""
+
+
+def _revision_cache_path(app):
+    # One cache file per database, so pointing DATABASE_URL elsewhere re-checks
+    url = app.config.get('SQLALCHEMY_DATABASE_URI') or ''
+    return os.path.join(app.instance_path, f"schema_revision-{hashlib.md5(url.encode()).hexdigest()[:8]}")
+
+
+def _read_cached_revision(app):
+    try:
+        with open(_revision_cache_path(app)) as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def _write_cached_revision(app, revision):
+    os.makedirs(app.instance_path, exist_ok=True)
+    with open(_revision_cache_path(app), 'w') as f:
+        f.write(revision or '')
+
+
+def head_revision(app):
+    """Latest revision in migrations/ (filesystem only, no DB)."""
+    with app.app_context():
+        config = migrate.get_config()
+    return ScriptDirectory.from_config(config).get_current_head()
+
+
+def _database_revision():
+    result = db.session.execute(text("SELECT version_num FROM alembic_version")).fetchone()
+    return result[0] if result else None
+
+
+def check_schema_revision(app):
+    """Warn (never migrate) if the DB is behind the code. Zero queries when cached."""
+    head = head_revision(app)
+    if _read_cached_revision(app) == head:
+        return True
+
+    with app.app_context():
+        try:
+            current = _database_revision()
+        except Exception as e:
+            db.session.rollback()
+            print(f"⚠ Schema check failed ({e}). Run: flask --app app setup-db")
+            return False
+        finally:
+            db.session.remove()
+
+    if current != head:
+        print(f"⚠ Database schema is at {current}, code expects {head}. "
+              f"Run: flask --app app setup-db")
+        return False
+
+    _write_cached_revision(app, head)
+    return True
+
+
+def _adopt_legacy_database():
+    """Bring a database made by the old create_all()+ALTER boot block to the baseline."""
+    db.session.execute(text(LEGACY_GROUPS_TABLE))
+    for sql in LEGACY_COLUMNS:
+        db.session.execute(text(sql))
+    db.session.commit()
+    stamp(revision=BASELINE_REVISION)
+    print(f"✓ Adopted existing database at revision {BASELINE_REVISION}")
+
+
+def setup_database(app):
+    """Apply migrations and seed an empty database. Safe to run on every deploy."""
+    with app.app_context():
+        tables = inspect(db.engine).get_table_names()
+        if 'alembic_version' not in tables and 'users' in tables:
+            _adopt_legacy_database()
+
+        upgrade()
+
+        from app.models import User
+        if User.query.count() == 0:
+            from seed import seed_data
+            seed_data()
+            print("✓ Seeded initial data (first launch).")
+
+        _write_cached_revision(app, _database_revision())
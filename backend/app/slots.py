@@ -0,0 +1,129 @@
+"""
+Pickup slots - how many orders each location can take per time bucket
+
+Time is cut into SLOT_MINUTES buckets. A bucket holds min(kitchen, lockers)
+orders: Location.slot_capacity (or SLOT_KITCHEN_CAPACITY) is what the
+kitchen can hand out per bucket, and every order of a bucket may need a
+locker cell at the same time. PickupSlot keeps a running count per
+(location, bucket). Booking one order is a single
+INSERT ... ON CONFLICT DO UPDATE SET booked = booked + 1 WHERE booked < capacity,
+so racing checkouts never overfill a bucket and no count(*) over orders is
+ever needed. A full bucket shifts the order up to SLOT_MAX_SHIFT buckets
+later, or refuses it. Cancelling an order gives its place back.
+"""
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import func, update
+from sqlalchemy.dialects import postgresql, sqlite
+from app import db
+from app.models import LockerCell, PickupSlot, generate_uuid
+
+# How far ahead an order may be scheduled
+MAX_AHEAD = timedelta(hours=3)
+
+
+class SlotFull(Exception):
+    """No bucket with room within reach; `next_available` is the earliest one with room, if any."""
+
+    def __init__(self, next_available=None):
+        super().__init__(next_available)
+        self.next_available = next_available
+
+
+def slot_length():
+    return timedelta(minutes=current_app.config['SLOT_MINUTES'])
+
+
+def bucket_start(moment):
+    """Start of the bucket `moment` falls into."""
+    midnight = moment.replace(hour=0, minute=0, second=0, microsecond=0)
+    length = slot_length()
+    return midnight + ((moment - midnight) // length) * length
+
+
+def slot_capacity(location):
+    """Orders one bucket of `location` can take."""
+    kitchen = location.slot_capacity or current_app.config['SLOT_KITCHEN_CAPACITY']
+    cells = db.session.query(func.count(LockerCell.id)).filter(
+        LockerCell.location_id == location.id).scalar()
+    # Locations without lockers hand orders over the counter
+    return min(kitchen, cells) if cells else kitchen
+
+
+def _book(location_id, starts_at, capacity):
+    # One atomic upsert; returns nothing when the bucket is already full
+    dialect = postgresql if db.session.get_bind().dialect.name == 'postgresql' else sqlite
+    statement = dialect.insert(PickupSlot).values(
+        id=generate_uuid(), location_id=location_id, starts_at=starts_at, booked=1
+    )
+    statement = statement.on_conflict_do_update(
+        index_elements=['location_id', 'starts_at'],
+        set_={'booked': PickupSlot.booked + 1},
+        where=PickupSlot.booked < capacity
+    ).returning(PickupSlot.booked)
+    return db.session.execute(statement).scalar() is not None
+
+
+def book_slot(location, scheduled_for, shift=True, now=None):
+    """
+    Book a place for one order. Returns the time to schedule it for:
+    `scheduled_for` itself, or the start of a later bucket if it was shifted.
+    Raises SlotFull. Runs inside the caller's transaction.
+    """
+    now = now or datetime.utcnow()
+    capacity = slot_capacity(location)
+    starts_at = bucket_start(scheduled_for)
+    tries = 1 + (current_app.config['SLOT_MAX_SHIFT'] if shift else 0)
+
+    if capacity > 0:
+        for attempt in range(tries):
+            if starts_at > now + MAX_AHEAD:
+                break
+            if _book(location.id, starts_at, capacity):
+                return scheduled_for if attempt == 0 else starts_at
+            starts_at += slot_length()
+
+    free = next((slot for slot in availability(location, now)
+                 if slot['available'] > 0 and slot['starts_at'] >= bucket_start(scheduled_for)), None)
+    raise SlotFull(free['starts_at'] if free else None)
+
+
+def release_slot(location_id, scheduled_for):
+    """Give a cancelled order's place back."""
+    db.session.execute(
+        update(PickupSlot)
+        .where(
+            PickupSlot.location_id == location_id,
+            PickupSlot.starts_at == bucket_start(scheduled_for),
+            # Orders placed before slots existed were never counted
+            PickupSlot.booked > 0
+        )
+        .values(booked=PickupSlot.booked - 1)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def availability(location, now=None):
+    """Every bucket from now to MAX_AHEAD with its capacity and bookings, one query."""
+    now = now or datetime.utcnow()
+    capacity = slot_capacity(location)
+    first, last = bucket_start(now), now + MAX_AHEAD
+
+    booked = dict(db.session.query(PickupSlot.starts_at, PickupSlot.booked).filter(
+        PickupSlot.location_id == location.id,
+        PickupSlot.starts_at >= first,
+        PickupSlot.starts_at <= last
+    ))
+
+    slots = []
+    starts_at = first
+    while starts_at <= last:
+        count = booked.get(starts_at, 0)
+        slots.append({
+            'starts_at': starts_at,
+            'capacity': capacity,
+            'booked': count,
+            'available': max(capacity - count, 0),
+        })
+        starts_at += slot_length()
+    return slots
@@ -0,0 +1,134 @@
+"""
+Stock reservation - atomic decrements of Inventory / DailyMenuItem stock_qty
+
+Every cart line is reserved with one conditional UPDATE
+(stock_qty IS NULL OR stock_qty >= qty), so concurrent checkouts never
+oversell and no row is read-modified-written under a lock. Everything runs
+inside the caller's transaction: a rollback undoes the whole reservation.
+"""
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import update, or_, func
+from app import db
+from app.events import bus
+from app.models import Order, OrderItem, Inventory, DailyMenuItem
+from app.slots import release_slot
+
+# Statuses whose stock is still held by the order
+HOLDING_STATUSES = ('CREATED', 'PAID', 'IN_KITCHEN')
+
+
+class OutOfStock(Exception):
+    """Raised when a line can't be reserved; the caller must roll back."""
+
+    def __init__(self, menu_item_id):
+        super().__init__(menu_item_id)
+        self.menu_item_id = menu_item_id
+
+
+def reserve_stock(location_id, daily_menu_id, quantities):
+    """Decrement stock for {menu_item_id: qty}. Raises OutOfStock."""
+    # Fixed lock order so two carts with the same items can't deadlock
+    for menu_item_id, qty in sorted(quantities.items()):
+        result = db.session.execute(
+            update(Inventory)
+            .where(
+                Inventory.location_id == location_id,
+                Inventory.menu_item_id == menu_item_id,
+                Inventory.is_available.is_(True),
+                or_(Inventory.stock_qty.is_(None), Inventory.stock_qty >= qty)
+            )
+            .values(stock_qty=Inventory.stock_qty - qty)
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount != 1:
+            raise OutOfStock(menu_item_id)
+
+        if not daily_menu_id:
+            continue
+
+        result = db.session.execute(
+            update(DailyMenuItem)
+            .where(
+                DailyMenuItem.daily_menu_id == daily_menu_id,
+                DailyMenuItem.menu_item_id == menu_item_id,
+                DailyMenuItem.is_available.is_(True),
+                or_(DailyMenuItem.stock_qty.is_(None), DailyMenuItem.stock_qty >= qty)
+            )
+            .values(stock_qty=DailyMenuItem.stock_qty - qty)
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount != 1:
+            raise OutOfStock(menu_item_id)
+
+
+def release_stock(order):
+    """Give an order's reserved portions back to Inventory / DailyMenuItem."""
+    if not order.stock_reserved:
+        # Placed before stock was reserved: there is nothing to give back
+        return
+    lines = db.session.query(
+        OrderItem.menu_item_id, func.sum(OrderItem.qty)
+    ).filter(OrderItem.order_id == order.id).group_by(OrderItem.menu_item_id).all()
+
+    for menu_item_id, qty in sorted(lines):
+        db.session.execute(
+            update(Inventory)
+            .where(
+                Inventory.location_id == order.location_id,
+                Inventory.menu_item_id == menu_item_id,
+                Inventory.stock_qty.isnot(None)
+            )
+            .values(stock_qty=Inventory.stock_qty + qty)
+            .execution_options(synchronize_session=False)
+        )
+        if order.daily_menu_id:
+            db.session.execute(
+                update(DailyMenuItem)
+                .where(
+                    DailyMenuItem.daily_menu_id == order.daily_menu_id,
+                    DailyMenuItem.menu_item_id == menu_item_id,
+                    DailyMenuItem.stock_qty.isnot(None)
+                )
+                .values(stock_qty=DailyMenuItem.stock_qty + qty)
+                .execution_options(synchronize_session=False)
+            )
+
+
+def cancel_order(order, from_statuses=HOLDING_STATUSES):
+    """
+    Compare-and-set the order to CANCELLED and release its stock and slot.
+    Returns False if another request already moved the order on, so stock
+    is never given back twice.
+    """
+    result = db.session.execute(
+        update(Order)
+        .where(Order.id == order.id, Order.status.in_(from_statuses))
+        .values(status='CANCELLED', updated_at=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount != 1:
+        return False
+
+    release_stock(order)
+    release_slot(order.location_id, order.scheduled_for)
+    return True
+
+
+def expire_unpaid_orders(now=None, limit=None):
+    """Cancel CREATED orders older than UNPAID_ORDER_TTL_MINUTES. Returns count."""
+    now = now or datetime.utcnow()
+    ttl = timedelta(minutes=current_app.config['UNPAID_ORDER_TTL_MINUTES'])
+
+    expired = Order.query.filter(
+        Order.status == 'CREATED',
+        Order.created_at < now - ttl
+    ).order_by(Order.created_at).limit(limit).all()
+
+    cancelled = [order for order in expired
+                 if cancel_order(order, from_statuses=('CREATED',))]
+    db.session.commit()
+
+    for order in cancelled:
+        bus.publish_order(order)
+    return len(cancelled)
@@ -0,0 +1,123 @@
+"""
+Expiry sweeper - flags locker cells whose hold ran out, cancels unpaid orders
+and forgets old idempotency keys
+
+One pass flags the cells of expired LockerReservations in batches (one
+UPDATE ... RETURNING per batch), expires CREATED orders past
+UNPAID_ORDER_TTL_MINUTES and Idempotency-Key responses past
+IDEMPOTENCY_TTL_HOURS. An expired hold still has the order's food inside, so
+its cell is not freed: it turns EXPIRED, which the allocator skips, until
+staff empty it (POST /api/cook/cells/<id>/clear) or the customer collects
+the order after all. Batches are claimed with
+FOR UPDATE SKIP LOCKED, so several workers or a cron job can sweep at the
+same time without double work.
+
+Run it from cron (`flask --app app sweep`) or set SWEEPER_INTERVAL_SECONDS
+to sweep in a background thread of every worker.
+"""
+import os
+import threading
+import time
+from datetime import datetime
+from sqlalchemy import select, update
+from app import db
+from app.idempotency import purge_expired
+from app.models import LockerCell, LockerReservation
+from app.stock import expire_unpaid_orders
+
+
+def flag_expired_holds(now=None, batch_size=500):
+    """Mark OCCUPIED cells whose hold is past hold_until EXPIRED. Returns count."""
+    now = now or datetime.utcnow()
+    flagged = 0
+    while True:
+        batch = select(LockerCell.id).join(
+            LockerReservation, LockerReservation.cell_id == LockerCell.id
+        ).where(
+            LockerReservation.released_at.is_(None),
+            LockerReservation.hold_until < now,
+            LockerCell.status == 'OCCUPIED'
+        ).limit(batch_size).with_for_update(of=LockerCell, skip_locked=True)
+
+        count = len(db.session.execute(
+            update(LockerCell)
+            .where(LockerCell.id.in_(batch), LockerCell.status == 'OCCUPIED')
+            .values(status='EXPIRED')
+            .returning(LockerCell.id)
+            .execution_options(synchronize_session=False)
+        ).all())
+        db.session.commit()
+        flagged += count
+        if count < batch_size:
+            return flagged
+
+
+def sweep(now=None, batch_size=500):
+    """One full pass. Returns {'expired_holds': n, 'expired_orders': n, 'expired_keys': n}."""
+    now = now or datetime.utcnow()
+    flagged = flag_expired_holds(now, batch_size)
+
+    expired = 0
+    while True:
+        count = expire_unpaid_orders(now, limit=batch_size)
+        expired += count
+        if count < batch_size:
+            break
+    return {
+        'expired_holds': flagged,
+        'expired_orders': expired,
+        'expired_keys': purge_expired(now, batch_size),
+    }
+
+
+class Sweeper:
+    """Optional in-process scheduler; one thread per worker process."""
+
+    def __init__(self):
+        self.app = None
+        self.interval = 0
+        self.batch_size = 500
+        self.last_run = None
+        self.last_counts = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.app = app
+        self.interval = app.config['SWEEPER_INTERVAL_SECONDS']
+        self.batch_size = app.config['SWEEPER_BATCH_SIZE']
+        if self.interval > 0:
+            self._ensure_thread()
+
+    def _ensure_thread(self):
+        # Started per process, so forked workers each get their own
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    threading.Thread(target=self._loop, daemon=True).start()
+                    self._pid = os.getpid()
+
+    def run_once(self):
+        with self.app.app_context():
+            try:
+                counts = sweep(batch_size=self.batch_size)
+            finally:
+                db.session.remove()
+        self.last_run = datetime.utcnow()
+        self.last_counts = counts
+        return counts
+
+    def _loop(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                counts = self.run_once()
+                if any(counts.values()):
+                    print(f"✓ sweeper: flagged {counts['expired_holds']} expired locker holds, "
+                          f"expired {counts['expired_orders']} unpaid orders, "
+                          f"purged {counts['expired_keys']} idempotency keys")
+            except Exception as e:
+                print(f"⚠ sweeper: {e}")
+
+
+sweeper = Sweeper()
@@ -0,0 +1,476 @@
+"""
+Load benchmarks for Smart Canteen hot paths.
+Run against a disposable Postgres database (DATABASE_URL), never production:
+
+  python bench.py stock [--orders 300] [--stock 10] [--workers 50]
+  python bench.py plans [--orders 1000000] [--keep]
+  python bench.py lockers [--orders 200] [--workers 50] [--policy nearest]
+  python bench.py login [--logins 2000] [--workers 8]
+  python bench.py menu-edit [--items 200]
+
+stock — fires parallel POST /api/orders at a single item with limited stock
+        and checks that exactly `stock` orders succeed and nothing oversells.
+plans — seeds a large order history, EXPLAINs the hot-path queries and fails
+        if any of them falls back to a sequential scan.
+lockers — marks many PAID orders READY in parallel and checks that no
+          locker cell is ever handed to two orders.
+login   — PIN check cost under the current hashing policy, then parallel
+          POST /api/auth/login; also checks a legacy hash ends up on the
+          current policy (rewritten only with PIN_PEPPER set).
+menu-edit — one admin PUT /api/admin/menu over many dishes; checks the
+            statement count does not grow with the number of items.
+"""
+import argparse
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from flask_jwt_extended import create_access_token
+from werkzeug.security import generate_password_hash
+from sqlalchemy import event, select, insert, func, text, tuple_
+from app import db, create_app
+from app.models import (
+    Location, User, MenuItem, Inventory, DailyMenu, DailyMenuItem,
+    Order, OrderItem, LockerCell, LockerReservation, generate_uuid
+)
+from app.lockers import POLICIES
+from app.pins import PEPPERED_PREFIX, hash_pin, verify_pin
+from app.slots import release_slot
+from app.routes.cook import QUEUE_STATUSES, _prep_sheet_query, _queue_query
+
+
+def _percentile(samples, pct):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * pct / 100))]
+
+
+def _report(name, latencies, elapsed):
+    print(f"{name}: {len(latencies)} requests in {elapsed:.2f}s "
+          f"({len(latencies) / elapsed:.0f} req/s)")
+    print(f"  latency p50={statistics.median(latencies) * 1000:.1f}ms "
+          f"p95={_percentile(latencies, 95) * 1000:.1f}ms "
+          f"max={max(latencies) * 1000:.1f}ms")
+
+
+def bench_stock(app, args):
+    """Contention benchmark: many buyers, one item, little stock."""
+    with app.app_context():
+        location = Location.query.first()
+        user = User.query.filter_by(org_id=location.org_id, role='user').first()
+        token = create_access_token(identity=user.id, additional_claims={'role': user.role})
+
+        item = MenuItem(id=f'bench-{generate_uuid()}', org_id=location.org_id,
+                        name_kz='Bench', name_ru='Bench', category='second', base_price=100)
+        db.session.add(item)
+        db.session.add(Inventory(location_id=location.id, menu_item_id=item.id,
+                                 is_available=True, stock_qty=args.stock))
+        daily_menu = DailyMenu.query.filter_by(
+            location_id=location.id, menu_date=date.today(), meal_slot='lunch'
+        ).first()
+        if daily_menu:
+            db.session.add(DailyMenuItem(daily_menu_id=daily_menu.id, menu_item_id=item.id,
+                                         stock_qty=args.stock, is_available=True))
+        db.session.commit()
+        item_id = item.id
+        location_id = location.id
+
+    headers = {'Authorization': f'Bearer {token}'}
+    body = {'items': [{'menu_item_id': item_id, 'qty': 1}]}
+
+    def place_order(_):
+        client = app.test_client()
+        started = time.perf_counter()
+        response = client.post('/api/orders', json=body, headers=headers)
+        error = (response.get_json(silent=True) or {}).get('error') if response.status_code != 201 else None
+        return response.status_code, error, time.perf_counter() - started
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        results = list(pool.map(place_order, range(args.orders)))
+    elapsed = time.perf_counter() - started
+
+    statuses = [status for status, _, _ in results]
+    errors = [error for _, error, _ in results]
+    _report('stock', [latency for _, _, latency in results], elapsed)
+    # slot_full: every reachable pickup slot is booked, not a stock decision
+    print(f"  201={statuses.count(201)} out_of_stock={errors.count('out_of_stock')} "
+          f"slot_full={errors.count('slot_full')} "
+          f"other={len(statuses) - statuses.count(201) - errors.count('out_of_stock') - errors.count('slot_full')}")
+
+    with app.app_context():
+        inv = Inventory.query.filter_by(location_id=location_id, menu_item_id=item_id).first()
+        dmi = DailyMenuItem.query.filter_by(menu_item_id=item_id).first()
+        sold = db.session.query(db.func.coalesce(db.func.sum(OrderItem.qty), 0)).filter(
+            OrderItem.menu_item_id == item_id).scalar()
+        print(f"  sold={sold} inventory_left={inv.stock_qty} "
+              f"daily_menu_left={dmi.stock_qty if dmi else '-'}")
+        # Sold out, or stopped short only by full slots; either way nothing lost
+        left = args.stock - sold
+        ok = (statuses.count(201) == sold and inv.stock_qty == left
+              and (dmi is None or dmi.stock_qty == left)
+              and (left == 0 or errors.count('slot_full') > 0))
+
+        # Clean up bench rows, giving their pickup slots back for the next run
+        orders = db.session.query(Order.id, Order.location_id, Order.scheduled_for).filter(
+            Order.id.in_(select(OrderItem.order_id).where(OrderItem.menu_item_id == item_id))).all()
+        for _, order_location_id, scheduled_for in orders:
+            release_slot(order_location_id, scheduled_for)
+        order_ids = [order_id for order_id, _, _ in orders]
+        OrderItem.query.filter(OrderItem.order_id.in_(order_ids)).delete(synchronize_session=False)
+        Order.query.filter(Order.id.in_(order_ids)).delete(synchronize_session=False)
+        DailyMenuItem.query.filter_by(menu_item_id=item_id).delete()
+        Inventory.query.filter_by(menu_item_id=item_id).delete()
+        MenuItem.query.filter_by(id=item_id).delete()
+        db.session.commit()
+
+    print("✓ no oversell" if ok else "✗ OVERSOLD or lost stock")
+    return ok
+
+
+PLAN_SEED_SQL = [
+    # Users, then orders spread over a year; ~0.1% still in the kitchen queue
+    """
+    INSERT INTO users (id, org_id, role, login, pin_hash, display_name, language, theme, created_at)
+    SELECT 'plan-user-' || n, :org_id, 'user', 'plan-user-' || n, 'x', 'Plan ' || n, 'ru', 'light', NOW()
+    FROM generate_series(1, :users) AS n
+    """,
+    """
+    INSERT INTO orders (id, user_id, location_id, status, scheduled_for, cook_by, total, priority,
+                        created_at, updated_at)
+    SELECT 'plan-' || n, 'plan-user-' || (n % :users + 1), :location_id,
+           CASE WHEN n % 1000 = 0 THEN 'PAID' WHEN n % 1000 = 1 THEN 'IN_KITCHEN'
+                WHEN n % 50 = 2 THEN 'CANCELLED' ELSE 'PICKED_UP' END,
+           ts + INTERVAL '1 hour', ts + INTERVAL '50 minutes', 1000, 0, ts, ts + INTERVAL '2 hours'
+    FROM (SELECT n, NOW() - INTERVAL '365 days' * random() AS ts
+          FROM generate_series(1, :orders) AS n) AS s
+    """,
+    """
+    INSERT INTO order_items (id, order_id, menu_item_id, qty, unit_price)
+    SELECT 'plan-' || n || '-' || line, 'plan-' || n, :menu_item_id, 1, 500
+    FROM generate_series(1, :orders) AS n, generate_series(1, 2) AS line
+    """,
+]
+
+PLAN_CLEANUP_SQL = [
+    "DELETE FROM order_items WHERE order_id LIKE 'plan-%'",
+    "DELETE FROM orders WHERE id LIKE 'plan-%'",
+    "DELETE FROM users WHERE id LIKE 'plan-user-%'",
+]
+
+
+def _plan_queries(location_id, user_id, menu_item_id, daily_menu_id):
+    """(name, statement, small_table) for every hot-path query shape."""
+    now = datetime.utcnow()
+    queries = [
+        ('my_orders', select(Order).where(
+            Order.user_id == user_id, tuple_(Order.created_at, Order.id) < tuple_(now, ''))
+            .order_by(Order.created_at.desc(), Order.id.desc()).limit(21), False),
+        ('queue_page', _queue_query(location_id).filter(Order.status.in_(QUEUE_STATUSES))
+            .filter(tuple_(Order.cook_by, Order.id) > tuple_(now, ''))
+            .order_by(Order.cook_by.asc(), Order.id.asc()).limit(101).statement, False),
+        ('queue_fingerprint', select(
+            select(func.max(Order.updated_at)).where(
+                Order.location_id == location_id, Order.status != 'CREATED').scalar_subquery(),
+            select(func.count()).select_from(Order).where(
+                Order.location_id == location_id, Order.status.in_(QUEUE_STATUSES)).scalar_subquery()
+        ), False),
+        ('queue_since', _queue_query(location_id).filter(Order.status != 'CREATED')
+            .filter(tuple_(Order.updated_at, Order.id) > tuple_(now, ''))
+            .order_by(Order.updated_at.asc(), Order.id.asc()).limit(101).statement, False),
+        ('prep_sheet', _prep_sheet_query(location_id, 'ru', now, now + timedelta(hours=3),
+                                         timedelta(minutes=15)).statement, False),
+        ('order_items', select(OrderItem).where(
+            OrderItem.order_id.in_([f'plan-{n}' for n in range(1000, 1100)])), False),
+        # Small tables: checked with enable_seqscan off (index must be usable)
+        ('inventory_lookup', select(Inventory).where(
+            Inventory.location_id == location_id, Inventory.menu_item_id == menu_item_id), True),
+        ('inventory_by_item', select(Inventory).where(Inventory.menu_item_id == menu_item_id), True),
+        ('free_cell', select(LockerCell).where(
+            LockerCell.location_id == location_id, LockerCell.status == 'FREE').limit(1), True),
+    ]
+    if daily_menu_id:
+        queries.append(('daily_menu_item', select(DailyMenuItem).where(
+            DailyMenuItem.daily_menu_id == daily_menu_id,
+            DailyMenuItem.menu_item_id == menu_item_id), True))
+    return queries
+
+
+def _seq_scans(plan):
+    """Relations read by a Seq Scan anywhere in an EXPLAIN (FORMAT JSON) plan."""
+    found = []
+    if plan.get('Node Type') == 'Seq Scan':
+        found.append(plan.get('Relation Name'))
+    for child in plan.get('Plans', []):
+        found.extend(_seq_scans(child))
+    return found
+
+
+def bench_plans(app, args):
+    """Index regression check: no hot-path query may seq-scan a big table."""
+    with app.app_context():
+        if db.engine.dialect.name != 'postgresql':
+            print("✗ plans needs a Postgres DATABASE_URL")
+            return False
+
+        location = Location.query.first()
+        menu_item = MenuItem.query.filter_by(org_id=location.org_id).first()
+        daily_menu = DailyMenu.query.filter_by(location_id=location.id).first()
+        params = {'org_id': location.org_id, 'location_id': location.id,
+                  'menu_item_id': menu_item.id, 'users': 1000, 'orders': args.orders}
+
+        started = time.perf_counter()
+        for sql in PLAN_CLEANUP_SQL + PLAN_SEED_SQL:
+            db.session.execute(text(sql), params)
+        db.session.commit()
+        db.session.execute(text("ANALYZE users, orders, order_items"))
+        db.session.commit()
+        print(f"seeded {args.orders} orders in {time.perf_counter() - started:.1f}s")
+
+        ok = True
+        connection = db.session.connection()
+        for name, statement, small_table in _plan_queries(
+                location.id, 'plan-user-1', menu_item.id, daily_menu.id if daily_menu else None):
+            compiled = statement.compile(dialect=db.engine.dialect,
+                                          compile_kwargs={'render_postcompile': True})
+            if small_table:
+                connection.exec_driver_sql("SET LOCAL enable_seqscan = off")
+            started = time.perf_counter()
+            plan = connection.exec_driver_sql(
+                f"EXPLAIN (ANALYZE, FORMAT JSON) {compiled}", compiled.params
+            ).scalar()[0]
+            elapsed = time.perf_counter() - started
+            if small_table:
+                connection.exec_driver_sql("SET LOCAL enable_seqscan = on")
+            scans = _seq_scans(plan['Plan'])
+            print(f"  {'✗' if scans else '✓'} {name:<18} {elapsed * 1000:7.1f}ms"
+                  f"{'  seq scan on ' + ', '.join(scans) if scans else ''}")
+            ok = ok and not scans
+        db.session.rollback()
+
+        if not args.keep:
+            for sql in PLAN_CLEANUP_SQL:
+                db.session.execute(text(sql))
+            db.session.commit()
+
+    print("✓ all hot paths use indexes" if ok else "✗ sequential scan on a hot path")
+    return ok
+
+
+def bench_lockers(app, args):
+    """Contention benchmark: more READY orders than free locker cells."""
+    app.config['LOCKER_POLICY'] = args.policy
+    with app.app_context():
+        location = Location.query.first()
+        location_id = location.id
+        cook = User.query.filter_by(org_id=location.org_id, role='cook').first()
+        token = create_access_token(identity=cook.id, additional_claims={'role': cook.role})
+        customer = User.query.filter_by(org_id=location.org_id, role='user').first()
+        menu_item = MenuItem.query.filter_by(org_id=location.org_id).first()
+
+        free_cells = {cell_id for (cell_id,) in db.session.query(LockerCell.id).filter_by(
+            location_id=location_id, status='FREE')}
+        order_ids = [f'bench-{generate_uuid()}' for _ in range(args.orders)]
+        db.session.execute(insert(Order), [{
+            'id': order_id, 'user_id': customer.id, 'location_id': location_id,
+            'status': 'PAID', 'scheduled_for': datetime.utcnow(), 'total': 500,
+        } for order_id in order_ids])
+        db.session.execute(insert(OrderItem), [{
+            'order_id': order_id, 'menu_item_id': menu_item.id, 'qty': 1 + i % 5,
+            'unit_price': 100,
+        } for i, order_id in enumerate(order_ids)])
+        db.session.commit()
+
+    headers = {'Authorization': f'Bearer {token}'}
+
+    def mark_ready(order_id):
+        client = app.test_client()
+        started = time.perf_counter()
+        response = client.post(f'/api/cook/orders/{order_id}/ready', json={}, headers=headers)
+        return response.status_code, (response.get_json() or {}).get('cell_code'), \
+            time.perf_counter() - started
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        results = list(pool.map(mark_ready, order_ids))
+    elapsed = time.perf_counter() - started
+
+    _report(f'lockers ({args.policy})', [latency for _, _, latency in results], elapsed)
+    codes = [code for status, code, _ in results if status == 200 and code]
+    errors = sum(1 for status, _, _ in results if status != 200)
+    print(f"  {len(free_cells)} free cells, assigned={len(codes)} "
+          f"distinct={len(set(codes))} errors={errors}")
+
+    with app.app_context():
+        reservations = LockerReservation.query.filter(
+            LockerReservation.order_id.in_(order_ids)).all()
+        booked = [reservation.cell_id for reservation in reservations]
+        ok = (errors == 0 and len(codes) == len(set(codes))
+              and len(booked) == len(set(booked)) == min(len(free_cells), args.orders)
+              and set(booked) <= free_cells)
+
+        # Clean up bench rows and give the cells back
+        LockerReservation.query.filter(LockerReservation.order_id.in_(order_ids)).delete(
+            synchronize_session=False)
+        LockerCell.query.filter(LockerCell.id.in_(booked)).update(
+            {'status': 'FREE'}, synchronize_session=False)
+        OrderItem.query.filter(OrderItem.order_id.in_(order_ids)).delete(synchronize_session=False)
+        Order.query.filter(Order.id.in_(order_ids)).delete(synchronize_session=False)
+        db.session.commit()
+
+    print("✓ no cell double-booked" if ok else "✗ DOUBLE-BOOKED or lost cells")
+    return ok
+
+
+def bench_login(app, args):
+    """Throughput benchmark: the whole school logs in at once."""
+    pin = '482913'
+    with app.app_context():
+        org_id = Location.query.first().org_id
+        pin_hash = hash_pin(pin)
+
+        samples = 200
+        started = time.perf_counter()
+        for _ in range(samples):
+            verify_pin(pin_hash, pin)
+        per_check = (time.perf_counter() - started) / samples
+        print(f"pin check ({app.config['PIN_HASH_METHOD']}"
+              f"{', peppered' if app.config['PIN_PEPPER'] else ''}): "
+              f"{per_check * 1000:.2f}ms = {1 / per_check:.0f} checks/s per core")
+
+        logins = [f'bench-login-{n}' for n in range(args.workers)]
+        db.session.add_all([User(org_id=org_id, login=login, pin_hash=pin_hash, role='user')
+                            for login in logins])
+        # werkzeug's default scrypt, as every PIN was hashed before the policy
+        legacy = User(org_id=org_id, login='bench-login-legacy', role='user',
+                      pin_hash=generate_password_hash(pin))
+        db.session.add(legacy)
+        db.session.commit()
+        legacy_id = legacy.id
+
+    def login(n):
+        client = app.test_client()
+        started = time.perf_counter()
+        # One device per login, so the per-IP login limit doesn't cap the benchmark
+        response = client.post('/api/auth/login', json={'login': logins[n % len(logins)], 'pin': pin},
+                               environ_base={'REMOTE_ADDR': f'10.{n >> 16 & 255}.{n >> 8 & 255}.{n & 255}'})
+        return response.status_code, time.perf_counter() - started
+
+    app.test_client().post('/api/auth/login', json={'login': 'bench-login-legacy', 'pin': pin})
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        results = list(pool.map(login, range(args.logins)))
+    elapsed = time.perf_counter() - started
+
+    statuses = [status for status, _ in results]
+    _report('login', [latency for _, latency in results], elapsed)
+
+    with app.app_context():
+        upgraded_hash = db.session.get(User, legacy_id).pin_hash
+        upgraded, needs_rehash = verify_pin(upgraded_hash, pin)
+        print(f"  200={statuses.count(200)} other={len(statuses) - statuses.count(200)} "
+              f"legacy hash now {upgraded_hash.replace(PEPPERED_PREFIX, 'peppered ').split('$')[0]} "
+              f"(on current policy={upgraded and not needs_rehash})")
+        ok = statuses.count(200) == len(statuses) and upgraded and not needs_rehash
+
+        User.query.filter(User.login.like('bench-login-%')).delete(synchronize_session=False)
+        db.session.commit()
+
+    print("✓ logins ok" if ok else "✗ failed logins or hash not upgraded")
+    return ok
+
+
+def bench_menu_edit(app, args):
+    """Statement count and latency of a large admin stock edit."""
+    with app.app_context():
+        location = Location.query.first()
+        admin = User.query.filter_by(org_id=location.org_id, role='admin').first()
+        token = create_access_token(identity=admin.id, additional_claims={'role': 'admin'})
+        location_id = location.id
+        item_ids = [f'bench-menu-{n}' for n in range(args.items)]
+        db.session.execute(insert(MenuItem), [{
+            'id': item_id, 'org_id': location.org_id, 'name_kz': 'Bench', 'name_ru': 'Bench',
+            'category': 'second', 'base_price': 100,
+        } for item_id in item_ids])
+        # Half already stocked here, half new to this location
+        db.session.execute(insert(Inventory), [{
+            'location_id': location_id, 'menu_item_id': item_id, 'stock_qty': 1,
+        } for item_id in item_ids[::2]])
+        db.session.commit()
+
+        statements = []
+        listen = lambda *a: statements.append(a[2])
+        event.listen(db.engine, 'before_cursor_execute', listen)
+
+    client = app.test_client()
+    headers = {'Authorization': f'Bearer {token}'}
+    latencies = []
+    started = time.perf_counter()
+    for qty in (5, 6, 7):
+        statements.clear()
+        request_started = time.perf_counter()
+        response = client.put(f'/api/admin/menu?location_id={location_id}', headers=headers,
+                              json={'items': [{'id': item_id, 'qty': qty, 'available': True}
+                                              for item_id in item_ids]})
+        latencies.append(time.perf_counter() - request_started)
+    elapsed = time.perf_counter() - started
+    _report('menu-edit', latencies, elapsed)
+
+    with app.app_context():
+        event.remove(db.engine, 'before_cursor_execute', listen)
+        stocked = Inventory.query.filter(Inventory.location_id == location_id,
+                                         Inventory.menu_item_id.in_(item_ids),
+                                         Inventory.stock_qty == 7).count()
+        print(f"  {args.items} items, {len(statements)} statements per edit, {stocked} rows at qty=7")
+        ok = response.status_code == 200 and stocked == args.items and len(statements) < 10
+
+        Inventory.query.filter(Inventory.menu_item_id.in_(item_ids)).delete(synchronize_session=False)
+        MenuItem.query.filter(MenuItem.id.in_(item_ids)).delete(synchronize_session=False)
+        db.session.commit()
+
+    print("✓ bulk edit is set-based" if ok else "✗ wrong stock or per-item statements")
+    return ok
+
+
+BENCHMARKS = {
+    'stock': bench_stock,
+    'plans': bench_plans,
+    'lockers': bench_lockers,
+    'login': bench_login,
+    'menu-edit': bench_menu_edit,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    sub = parser.add_subparsers(dest='bench', required=True)
+
+    stock = sub.add_parser('stock', help='parallel orders against one item')
+    stock.add_argument('--orders', type=int, default=300)
+    stock.add_argument('--stock', type=int, default=10)
+    stock.add_argument('--workers', type=int, default=50)
+
+    plans = sub.add_parser('plans', help='EXPLAIN hot-path queries on a large dataset')
+    plans.add_argument('--orders', type=int, default=1_000_000)
+    plans.add_argument('--keep', action='store_true', help='leave the seeded rows in place')
+
+    lockers = sub.add_parser('lockers', help='parallel mark-ready against few locker cells')
+    lockers.add_argument('--orders', type=int, default=200)
+    lockers.add_argument('--workers', type=int, default=50)
+    lockers.add_argument('--policy', default='nearest', choices=sorted(POLICIES))
+
+    login = sub.add_parser('login', help='PIN check cost and parallel logins')
+    login.add_argument('--logins', type=int, default=2000)
+    login.add_argument('--workers', type=int, default=8)
+
+    menu_edit = sub.add_parser('menu-edit', help='one admin stock edit over many dishes')
+    menu_edit.add_argument('--items', type=int, default=200)
+
+    args = parser.parse_args()
+    ok = BENCHMARKS[args.bench](create_app(), args)
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
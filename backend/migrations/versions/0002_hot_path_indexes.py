@@ -0,0 +1,46 @@
+"""hot path indexes
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17 10:07:14.980907
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+
+# (table, index, columns, partial-index predicate)
+INDEXES = [
+    ('daily_menu_items', 'ix_daily_menu_items_menu_item', ['daily_menu_id', 'menu_item_id'], None),
+    ('inventory', 'ix_inventory_menu_item', ['menu_item_id'], None),
+    ('locker_cells', 'ix_locker_cells_location_status', ['location_id', 'status'], None),
+    ('order_items', 'ix_order_items_order', ['order_id'], None),
+    ('orders', 'ix_orders_active_queue', ['location_id', 'scheduled_for', 'id'],
+     "status IN ('PAID', 'IN_KITCHEN')"),
+    ('orders', 'ix_orders_location_updated', ['location_id', 'updated_at', 'id'], None),
+    ('orders', 'ix_orders_status_scheduled', ['status', 'scheduled_for'], None),
+    ('orders', 'ix_orders_user_created', ['user_id', 'created_at'], None),
+]
+
+
+def upgrade():
+    # CONCURRENTLY so a large orders table stays writable during the deploy;
+    # that can't run inside a transaction, hence the autocommit block
+    with op.get_context().autocommit_block():
+        for table, name, columns, where in INDEXES:
+            op.create_index(name, table, columns, unique=False,
+                            postgresql_concurrently=True,
+                            postgresql_where=sa.text(where) if where else None)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for table, name, columns, where in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True)
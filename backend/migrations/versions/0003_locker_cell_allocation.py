@@ -0,0 +1,28 @@
+"""locker cell allocation
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-17 11:20:41.512308
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('locker_cells', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('size', sa.String(length=1), server_default='M', nullable=False))
+        batch_op.add_column(sa.Column('last_assigned_at', sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('locker_cells', schema=None) as batch_op:
+        batch_op.drop_column('last_assigned_at')
+        batch_op.drop_column('size')
@@ -0,0 +1,29 @@
+"""reservation expiry index
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-17 11:52:08.306115
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0004'
+down_revision = '0003'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.get_context().autocommit_block():
+        op.create_index('ix_locker_reservations_expiry', 'locker_reservations', ['hold_until'],
+                        unique=False, postgresql_concurrently=True,
+                        postgresql_where=sa.text('released_at IS NULL'))
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_locker_reservations_expiry', table_name='locker_reservations',
+                      postgresql_concurrently=True)
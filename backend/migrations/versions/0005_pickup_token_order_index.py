@@ -0,0 +1,28 @@
+"""pickup token order index
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-17 12:31:44.071926
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0005'
+down_revision = '0004'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.get_context().autocommit_block():
+        op.create_index('ix_pickup_tokens_order', 'pickup_tokens', ['order_id'],
+                        unique=False, postgresql_concurrently=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_pickup_tokens_order', table_name='pickup_tokens',
+                      postgresql_concurrently=True)
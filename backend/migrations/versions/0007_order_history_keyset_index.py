@@ -0,0 +1,32 @@
+"""order history keyset index
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-17 13:47:52.118406
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0007'
+down_revision = '0006'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # id joins the key so /orders/my pages on (created_at, id) straight off the
+    # index; the new one is built before the old one goes, so there's no gap
+    with op.get_context().autocommit_block():
+        op.create_index('ix_orders_user_history', 'orders', ['user_id', 'created_at', 'id'],
+                        unique=False, postgresql_concurrently=True)
+        op.drop_index('ix_orders_user_created', table_name='orders', postgresql_concurrently=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.create_index('ix_orders_user_created', 'orders', ['user_id', 'created_at'],
+                        unique=False, postgresql_concurrently=True)
+        op.drop_index('ix_orders_user_history', table_name='orders', postgresql_concurrently=True)
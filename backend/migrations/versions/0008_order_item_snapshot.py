@@ -0,0 +1,63 @@
+"""order item snapshot
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-17 14:22:05.934117
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0008'
+down_revision = '0007'
+branch_labels = None
+depends_on = None
+
+# Rows per backfill UPDATE, so a big order_items table isn't locked in one go
+BATCH_SIZE = 10000
+
+# Batches walk the primary key: each one is an index range, not a rescan
+# for the rows still NULL
+NEXT_BATCH_END = sa.text("""
+    SELECT max(id) FROM (
+        SELECT id FROM order_items WHERE id > :after ORDER BY id LIMIT :batch_size
+    ) AS batch
+""")
+
+BACKFILL = sa.text("""
+    UPDATE order_items SET
+        name_kz = (SELECT name_kz FROM menu_items WHERE menu_items.id = order_items.menu_item_id),
+        name_ru = (SELECT name_ru FROM menu_items WHERE menu_items.id = order_items.menu_item_id),
+        name_en = (SELECT name_en FROM menu_items WHERE menu_items.id = order_items.menu_item_id),
+        category = (SELECT category FROM menu_items WHERE menu_items.id = order_items.menu_item_id)
+    WHERE id > :after AND id <= :until AND name_ru IS NULL
+""")
+
+
+def upgrade():
+    with op.batch_alter_table('order_items', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('name_kz', sa.String(length=255), nullable=True))
+        batch_op.add_column(sa.Column('name_ru', sa.String(length=255), nullable=True))
+        batch_op.add_column(sa.Column('name_en', sa.String(length=255), nullable=True))
+        batch_op.add_column(sa.Column('category', sa.String(length=50), nullable=True))
+
+    # Lines get the names their dish has today: the best there is for old orders
+    connection = op.get_bind()
+    with op.get_context().autocommit_block():
+        after = ''
+        while True:
+            until = connection.execute(NEXT_BATCH_END, {'after': after, 'batch_size': BATCH_SIZE}).scalar()
+            if until is None:
+                break
+            connection.execute(BACKFILL, {'after': after, 'until': until})
+            after = until
+
+
+def downgrade():
+    with op.batch_alter_table('order_items', schema=None) as batch_op:
+        batch_op.drop_column('category')
+        batch_op.drop_column('name_en')
+        batch_op.drop_column('name_ru')
+        batch_op.drop_column('name_kz')
@@ -0,0 +1,37 @@
+"""pickup slots
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2026-10-17 16:40:52.902117
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0010'
+down_revision = '0009'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('pickup_slots',
+    sa.Column('id', sa.String(length=36), nullable=False),
+    sa.Column('location_id', sa.String(length=36), nullable=False),
+    sa.Column('starts_at', sa.DateTime(), nullable=False),
+    sa.Column('booked', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['location_id'], ['locations.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('location_id', 'starts_at', name='uq_pickup_slot_location_start')
+    )
+    with op.batch_alter_table('locations', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('slot_capacity', sa.Integer(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('locations', schema=None) as batch_op:
+        batch_op.drop_column('slot_capacity')
+
+    op.drop_table('pickup_slots')
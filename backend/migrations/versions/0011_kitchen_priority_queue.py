@@ -0,0 +1,52 @@
+"""kitchen priority queue
+
+Revision ID: 0011
+Revises: 0010
+Create Date: 2026-10-17 18:05:27.331940
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0011'
+down_revision = '0010'
+branch_labels = None
+depends_on = None
+
+QUEUE_WHERE = "status IN ('PAID', 'IN_KITCHEN')"
+
+
+def upgrade():
+    with op.batch_alter_table('menu_items', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('prep_minutes', sa.Integer(), nullable=True))
+    with op.batch_alter_table('orders', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('cook_by', sa.DateTime(), nullable=True))
+
+    # Only orders that can still reach the queue need a key; they start out
+    # in deadline order, finished history stays NULL
+    op.execute(sa.text(
+        "UPDATE orders SET cook_by = scheduled_for "
+        "WHERE status IN ('CREATED', 'PAID', 'IN_KITCHEN')"
+    ))
+
+    # New queue index first, then the old one goes, so there's no gap
+    with op.get_context().autocommit_block():
+        op.create_index('ix_orders_kitchen_queue', 'orders', ['location_id', 'cook_by', 'id'],
+                        unique=False, postgresql_concurrently=True,
+                        postgresql_where=sa.text(QUEUE_WHERE))
+        op.drop_index('ix_orders_active_queue', table_name='orders', postgresql_concurrently=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.create_index('ix_orders_active_queue', 'orders', ['location_id', 'scheduled_for', 'id'],
+                        unique=False, postgresql_concurrently=True,
+                        postgresql_where=sa.text(QUEUE_WHERE))
+        op.drop_index('ix_orders_kitchen_queue', table_name='orders', postgresql_concurrently=True)
+
+    with op.batch_alter_table('orders', schema=None) as batch_op:
+        batch_op.drop_column('cook_by')
+    with op.batch_alter_table('menu_items', schema=None) as batch_op:
+        batch_op.drop_column('prep_minutes')
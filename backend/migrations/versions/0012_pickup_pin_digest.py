@@ -0,0 +1,32 @@
+"""pickup pin digest
+
+Revision ID: 0012
+Revises: 0011
+Create Date: 2026-10-17 19:40:12.518203
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0012'
+down_revision = '0011'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('pickup_tokens', schema=None) as batch_op:
+        batch_op.alter_column('pin_code', existing_type=sa.String(length=6),
+                              type_=sa.String(length=64), existing_nullable=False)
+    # Drop plaintext PINs; those orders fall back to orders.pickup_code until collected
+    op.execute("UPDATE pickup_tokens SET pin_code = ''")
+
+
+def downgrade():
+    # Digests don't fit in 6 characters and can't be reversed
+    op.execute("UPDATE pickup_tokens SET pin_code = ''")
+    with op.batch_alter_table('pickup_tokens', schema=None) as batch_op:
+        batch_op.alter_column('pin_code', existing_type=sa.String(length=64),
+                              type_=sa.String(length=6), existing_nullable=False)
@@ -0,0 +1,28 @@
+"""order stock reserved
+
+Revision ID: 0013
+Revises: 0012
+Create Date: 2026-10-17 21:12:44.806391
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0013'
+down_revision = '0012'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Existing orders default to false: they were placed without taking stock,
+    # so cancelling or expiring them must not give any back
+    with op.batch_alter_table('orders', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('stock_reserved', sa.Boolean(), server_default=sa.false(), nullable=False))
+
+
+def downgrade():
+    with op.batch_alter_table('orders', schema=None) as batch_op:
+        batch_op.drop_column('stock_reserved')
@@ -4,21 +4,22 @@ Seed data for Smart Canteen MVP
 3 groups: 10A (school), CS-101 (university), Floor 3 (business)
 
 Two entry points:
-  - seed_data()  — called from run.py on first launch (no app context needed, caller provides it)
-  - seed()       — standalone: python seed.py (creates its own app context)
+  - seed_data()  — called from app.schema.setup_database on first launch (caller provides app context)
+  - seed()       — standalone: python seed.py (creates its own app context, wipes and reseeds)
 """
 from datetime import time, date, datetime, timedelta
-from werkzeug.security import generate_password_hash
+from flask_migrate import upgrade
 from app import db, create_app
+from app.pins import hash_pin
 from app.models import (
     Organization, Location, User, MenuItem, Inventory, LockerCell,
     DailyMenu, DailyMenuItem, Order, OrderItem, Receipt,
-    LockerReservation, PickupToken, Group
+    LockerReservation, PickupToken, Group, PickupSlot
 )
 
 
 def seed_data():
-    """Insert seed rows. Assumes caller has already set up app context and called db.create_all()."""
+    """Insert seed rows. Assumes caller has already set up app context and migrated the schema."""
 
     # Clear existing data (order matters for FK constraints)
     PickupToken.query.delete()
@@ -29,6 +30,7 @@ def seed_data():
     DailyMenuItem.query.delete()
     DailyMenu.query.delete()
     LockerCell.query.delete()
+    PickupSlot.query.delete()
     Inventory.query.delete()
     MenuItem.query.delete()
     # Clear group_id from users before deleting groups
@@ -65,7 +67,7 @@ def seed_data():
     db.session.flush()
 
     # Users (PIN = 123456)
-    pin_hash = generate_password_hash('123456')
+    pin_hash = hash_pin('123456')
     users = [
         User(id='admin-1', org_id='org-1', role='admin', login='admin',
              pin_hash=pin_hash, display_name='Администратор'),
@@ -132,7 +134,8 @@ def seed_data():
 
     # Locker Cells A1-A10
     cells = [
-        LockerCell(id=f'cell-{i}', location_id='loc-1', code=f'A{i}', status='FREE')
+        LockerCell(id=f'cell-{i}', location_id='loc-1', code=f'A{i}', status='FREE',
+                   size='S' if i <= 4 else 'M' if i <= 8 else 'L')
         for i in range(1, 11)
     ]
     db.session.add_all(cells)
@@ -173,8 +176,10 @@ def seed_data():
     db.session.flush()
 
     demo_items = [
-        OrderItem(order_id='order-demo-1', menu_item_id='item-1', qty=1, unit_price=450),
-        OrderItem(order_id='order-demo-1', menu_item_id='item-3', qty=1, unit_price=650),
+        OrderItem(order_id='order-demo-1', menu_item_id='item-1', qty=1, unit_price=450,
+                  name_kz='Борщ', name_ru='Борщ', category='first'),
+        OrderItem(order_id='order-demo-1', menu_item_id='item-3', qty=1, unit_price=650,
+                  name_kz='Плов', name_ru='Плов', category='second'),
     ]
     db.session.add_all(demo_items)
 
@@ -189,7 +194,7 @@ def seed():
     """Standalone entry point: creates app context, then seeds."""
     app = create_app()
     with app.app_context():
-        db.create_all()
+        upgrade()
         seed_data()
 
 
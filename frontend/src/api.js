@@ -1,4 +1,6 @@
 // API wrapper with auth header
+import { getLang } from './i18n.js';
+
 const API_BASE = (import.meta.env.VITE_API_URL || '/api').replace(/\/$/, '');
 
 export function getToken() {
@@ -34,6 +36,8 @@ export async function api(endpoint, options = {}) {
     const token = getToken();
     const headers = {
         'Content-Type': 'application/json',
+        // Server picks dish names in this language
+        'Accept-Language': getLang(),
         ...(options.headers || {})
     };
 
@@ -93,6 +97,60 @@ export async function api(endpoint, options = {}) {
     return data;
 }
 
+// ==================== Order events (SSE) ====================
+
+let orderStream = null;
+let orderPoll = null;
+
+// How often to refresh when the server has no stream slot for us
+const ORDER_POLL_MS = 30000;
+
+// Live order status changes from /stream/orders (one stream per page).
+// If the stream is refused (server full) or unavailable, onEvent(null) is
+// called every ORDER_POLL_MS instead, so the page re-fetches.
+export function subscribeOrderEvents(onEvent) {
+    const token = getToken();
+    if (orderStream || orderPoll || !token) return;
+
+    const poll = () => {
+        orderPoll = setTimeout(() => {
+            orderPoll = null;
+            onEvent(null);
+        }, ORDER_POLL_MS);
+    };
+    if (typeof EventSource === 'undefined') {
+        poll();
+        return;
+    }
+
+    orderStream = new EventSource(`${API_BASE}/stream/orders?jwt=${encodeURIComponent(token)}`);
+    orderStream.addEventListener('order', (e) => {
+        try {
+            onEvent(JSON.parse(e.data));
+        } catch {
+            // Ignore malformed events
+        }
+    });
+    orderStream.addEventListener('error', () => {
+        // CONNECTING = normal reconnect; CLOSED = refused (503), give up and poll
+        if (orderStream && orderStream.readyState === EventSource.CLOSED) {
+            orderStream = null;
+            poll();
+        }
+    });
+}
+
+export function unsubscribeOrderEvents() {
+    if (orderStream) {
+        orderStream.close();
+        orderStream = null;
+    }
+    if (orderPoll) {
+        clearTimeout(orderPoll);
+        orderPoll = null;
+    }
+}
+
 // Cart state (in memory + localStorage backup)
 let cart = JSON.parse(localStorage.getItem('cart') || '[]');
 
@@ -197,6 +255,6 @@ export async function saveDailyMenu(payload) {
 
 // ==================== Orders API ====================
 
-export async function getMyOrders() {
-    return api('/orders/my');
+export async function getMyOrders(cursor = null) {
+    return api('/orders/my' + (cursor ? `?cursor=${encodeURIComponent(cursor)}` : ''));
 }
@@ -46,7 +46,12 @@ const translations = {
         cookTitle: 'Аспаз кезегі',
         noOrders: 'Кезекте тапсырыс жоқ',
         refresh: 'Жаңарту',
+        loadMore: 'Тағы көрсету',
         markReady: 'Дайын деп белгілеу',
+        startCooking: 'Дайындауды бастау',
+        prepSheet: 'Не дайындау керек',
+        overdue: 'Кешіккен',
+        bump: 'Жоғарылату',
         ready: 'Дайын!',
         cell: 'Ұяшық',
         pin: 'PIN',
@@ -67,6 +72,7 @@ const translations = {
         statusInKitchen: 'Дайындалуда',
         statusReady: 'Дайын',
         statusClaimed: 'Алынды',
+        statusCancelled: 'Бас тартылды',
         // Admin
         admin: 'Админ',
         adminTitle: 'Мәзірді басқару',
@@ -182,7 +188,12 @@ const translations = {
         cookTitle: 'Очередь повара',
         noOrders: 'Нет заказов в очереди',
         refresh: 'Обновить',
+        loadMore: 'Показать ещё',
         markReady: 'Отметить готовым',
+        startCooking: 'Начать готовить',
+        prepSheet: 'Что готовить',
+        overdue: 'Просрочено',
+        bump: 'Поднять',
         ready: 'Готово!',
         cell: 'Ячейка',
         pin: 'PIN',
@@ -203,6 +214,7 @@ const translations = {
         statusInKitchen: 'Готовится',
         statusReady: 'Готов',
         statusClaimed: 'Получен',
+        statusCancelled: 'Отменён',
         // Admin
         admin: 'Админ',
         adminTitle: 'Управление меню',
@@ -318,7 +330,12 @@ const translations = {
         cookTitle: 'Cook Queue',
         noOrders: 'No orders in queue',
         refresh: 'Refresh',
+        loadMore: 'Show more',
         markReady: 'Mark Ready',
+        startCooking: 'Start cooking',
+        prepSheet: 'Prep sheet',
+        overdue: 'Overdue',
+        bump: 'Bump',
         ready: 'Ready!',
         cell: 'Cell',
         pin: 'PIN',
@@ -339,6 +356,7 @@ const translations = {
         statusInKitchen: 'In Kitchen',
         statusReady: 'Ready',
         statusClaimed: 'Claimed',
+        statusCancelled: 'Cancelled',
         // Admin
         admin: 'Admin',
         adminTitle: 'Menu Management',
@@ -418,7 +436,8 @@ const statusMap = {
     'PAID': 'statusPaid',
     'IN_KITCHEN': 'statusInKitchen',
     'READY': 'statusReady',
-    'CLAIMED': 'statusClaimed'
+    'CLAIMED': 'statusClaimed',
+    'CANCELLED': 'statusCancelled'
 };
 
 export function getLang() {
@@ -8,7 +8,7 @@ import { renderDailyMenu } from './pages/daily_menu.js';
 import { renderPickup } from './pages/pickup.js';
 import { renderMyOrders } from './pages/my_orders.js';
 import { renderAdmin } from './pages/admin.js';
-import { getToken, getUser, clearToken, clearUser } from './api.js';
+import { getToken, getUser, clearToken, clearUser, unsubscribeOrderEvents } from './api.js';
 import { getLang, setLang, t } from './i18n.js';
 
 // Role-based route access lists
@@ -95,6 +95,7 @@ function navigateTo(page) {
 
 // Logout handler
 function logout() {
+  unsubscribeOrderEvents();
   clearToken();
   clearUser();
   updateAuthUI();
@@ -129,6 +130,9 @@ async function handleRoute() {
     btn.classList.toggle('active', btn.dataset.page === hash);
   });
 
+  // Pages that need live order events subscribe again after rendering
+  unsubscribeOrderEvents();
+
   // Render the appropriate page
   switch (hash) {
     case 'login':
@@ -27,6 +27,9 @@ export async function renderCheckout(container, navigateTo) {
         itemsHtml += `<div>${item.name} x ${item.qty} = ${subtotal} ₸</div>`;
     });
 
+    // Same key for every tap on this page: a re-tap gets the first order back
+    const orderKey = `order-${Date.now().toString(36)}-${Math.random().toString(36).slice(2)}`;
+
     container.innerHTML = `
     <h2>${t('checkoutTitle')}</h2>
     <div style="margin-bottom:16px">
@@ -45,6 +48,7 @@ export async function renderCheckout(container, navigateTo) {
             // 1. Create order
             const orderData = await api('/orders', {
                 method: 'POST',
+                headers: { 'Idempotency-Key': orderKey },
                 body: JSON.stringify({
                     location_id: 'loc-1',
                     scheduled_for: null,
@@ -63,6 +67,8 @@ export async function renderCheckout(container, navigateTo) {
             // 2. Fake payment
             const paymentData = await api('/payments/fake', {
                 method: 'POST',
+                // One key per order: a retried tap replays the first receipt
+                headers: { 'Idempotency-Key': `pay-${orderData.order_id}` },
                 body: JSON.stringify({
                     order_id: orderData.order_id
                 })
@@ -76,6 +82,7 @@ export async function renderCheckout(container, navigateTo) {
           <div><strong>${t('orderId')}:</strong> ${orderData.order_id}</div>
           <div><strong>${t('status')}:</strong> ${tStatus('PAID')}</div>
           <div><strong>${t('total')}:</strong> ${orderData.total} ₸</div>
+          <div><strong>${t('scheduled')}:</strong> ${new Date(orderData.scheduled_for).toLocaleString()}</div>
         </div>
       `;
 
@@ -1,6 +1,28 @@
-import { api, getToken, getUser } from '../api.js';
+import { api, getToken, getUser, subscribeOrderEvents } from '../api.js';
 import { t, tStatus } from '../i18n.js';
 
+// Portions to cook per pickup slot, summed on the server
+async function renderPrepSheet(target) {
+    try {
+        const sheet = await api('/cook/prep-sheet?location_id=loc-1');
+        if (!sheet.buckets.length) return;
+        let html = `<h3>${t('prepSheet')}</h3>`;
+        sheet.buckets.forEach(bucket => {
+            const when = bucket.starts_at
+                ? new Date(bucket.starts_at).toLocaleTimeString([], { hour: '2-digit', minute: '2-digit' })
+                : t('overdue');
+            const items = bucket.categories
+                .flatMap(c => c.items)
+                .map(i => `${i.name} x${i.qty}`)
+                .join(', ');
+            html += `<div><strong>${when}:</strong> ${items}</div>`;
+        });
+        target.innerHTML = html;
+    } catch (err) {
+        target.innerHTML = '';
+    }
+}
+
 export async function renderCook(container, navigateTo) {
     const token = getToken();
     const user = getUser();
@@ -17,6 +39,14 @@ export async function renderCook(container, navigateTo) {
 
     container.innerHTML = `<h2>${t('cookTitle')}</h2><p>${t('loading')}</p>`;
 
+    // New paid orders or cancellations change the queue; READY is our own action.
+    // null = polling fallback tick (no stream slot free)
+    subscribeOrderEvents((event) => {
+        if (!event || event.status === 'PAID' || event.status === 'CANCELLED') {
+            renderCook(container, navigateTo);
+        }
+    });
+
     try {
         const data = await api('/cook/orders/queue?location_id=loc-1');
 
@@ -30,7 +60,7 @@ export async function renderCook(container, navigateTo) {
             return;
         }
 
-        let html = `<h2>${t('cookTitle')}</h2>`;
+        let html = `<h2>${t('cookTitle')}</h2><div id="prep-sheet" class="order-card"></div>`;
 
         data.orders.forEach(order => {
             const items = order.items.map(i => `${i.name} x${i.qty}`).join(', ');
@@ -41,6 +71,8 @@ export async function renderCook(container, navigateTo) {
           <div><strong>${t('user')}:</strong> ${order.user.display_name}</div>
           <div><strong>${t('items')}:</strong> ${items}</div>
           <div><strong>${t('scheduled')}:</strong> ${new Date(order.scheduled_for).toLocaleString()}</div>
+          ${order.status === 'PAID' ? `<button class="btn queue-action" data-id="${order.id}" data-action="start" style="margin-top:8px">${t('startCooking')}</button>` : ''}
+          <button class="btn queue-action" data-id="${order.id}" data-action="bump" style="margin-top:8px">${t('bump')}${order.priority ? ` (${order.priority})` : ''}</button>
           <button class="btn mark-ready" data-id="${order.id}" style="margin-top:8px">
             ${t('markReady')}
           </button>
@@ -52,6 +84,7 @@ export async function renderCook(container, navigateTo) {
         html += `<button class="btn" id="refresh-queue" style="margin-top:16px">${t('refresh')}</button>`;
 
         container.innerHTML = html;
+        renderPrepSheet(container.querySelector('#prep-sheet'));
 
         // Mark ready handlers
         container.querySelectorAll('.mark-ready').forEach(btn => {
@@ -78,6 +111,21 @@ export async function renderCook(container, navigateTo) {
             });
         });
 
+        // Start cooking / bump: the server reorders the queue, so reload it
+        container.querySelectorAll('.queue-action').forEach(btn => {
+            btn.addEventListener('click', async () => {
+                const resultSpan = container.querySelector(`.ready-result[data-id="${btn.dataset.id}"]`);
+                btn.disabled = true;
+                try {
+                    await api(`/cook/orders/${btn.dataset.id}/${btn.dataset.action}`, { method: 'POST' });
+                    renderCook(container, navigateTo);
+                } catch (err) {
+                    resultSpan.innerHTML = `<span class="error"> ${t('error')}: ${err.message || err.error}</span>`;
+                    btn.disabled = false;
+                }
+            });
+        });
+
         container.querySelector('#refresh-queue').addEventListener('click', () => renderCook(container, navigateTo));
 
     } catch (err) {
@@ -2,11 +2,11 @@ import { api, addToCart, getToken } from '../api.js';
 import { t, getLang } from '../i18n.js';
 import { getItemMeta, placeholderImage } from '../menu_meta.js';
 
-// Get localized name
+// Get localized name (the server already picks it from Accept-Language)
 function getLocalizedName(item, lang) {
+  if (item.name) return item.name;
   if (lang === 'kz' && item.name_kz) return item.name_kz;
-  if (lang === 'ru' && item.name_ru) return item.name_ru;
-  return item.name || item.name_ru || item.name_kz;
+  return item.name_ru || item.name_kz;
 }
 
 // Get localized description from meta
@@ -53,7 +53,14 @@ export async function renderMenu(container, navigateTo) {
 async function loadMenuForDate(container, selectedDate, navigateTo) {
   try {
     const url = `/menu?location_id=loc-1&date=${selectedDate}`;
-    const data = await api(url);
+    // The menu is a cached snapshot; portions left come separately, always fresh
+    const [data, stock] = await Promise.all([
+      api(url),
+      api(`/menu/stock?location_id=loc-1&date=${selectedDate}`).catch(() => null),
+    ]);
+    (data.items || []).forEach(item => {
+      item.stock_qty = stock?.stock?.[item.id];
+    });
 
     const dateOptions = getDateOptions();
     const lang = getLang();
@@ -1,6 +1,8 @@
-import { api, getToken, getMyOrders } from '../api.js';
+import { api, getToken, getMyOrders, subscribeOrderEvents, unsubscribeOrderEvents } from '../api.js';
 import { t, tStatus } from '../i18n.js';
 
+const FINISHED_STATUSES = ['PICKED_UP', 'CANCELLED'];
+
 export async function renderMyOrders(container, navigateTo) {
     const token = getToken();
 
@@ -24,44 +26,70 @@ export async function renderMyOrders(container, navigateTo) {
             return;
         }
 
-        let html = `<h2>Мои заказы</h2>`;
-
-        data.orders.forEach(order => {
-            const items = order.items.map(i => `${i.name} x${i.qty}`).join(', ');
-            const statusClass = order.status === 'READY' ? 'success' : (order.status === 'PICKED_UP' ? 'info' : 'warning');
-
-            html += `
-            <div class="order-card" style="margin-bottom:12px">
-              <div class="order-card-header">
-                <span class="order-card-id">#${order.id.slice(-8)}</span>
-                <span class="order-card-status" style="background:${order.status === 'READY' ? '#d1fae5' : '#fef3c7'};color:${order.status === 'READY' ? '#065f46' : '#92400e'}">${tStatus(order.status)}</span>
-              </div>
-              <div><strong>${t('items')}:</strong> ${items}</div>
-              <div><strong>${t('total')}:</strong> ${order.total} ₸</div>
-              <div style="font-size:13px;color:#666">${new Date(order.created_at).toLocaleString()}</div>
-            `;
-
-            // Show pickup code prominently when order is READY
-            if (order.status === 'READY' && order.pickup_code) {
-                html += `
-                <div style="margin-top:10px;padding:12px;background:#d1fae5;border:2px solid #065f46;border-radius:8px;text-align:center">
-                  <div style="font-size:13px;color:#065f46;margin-bottom:4px">Код выдачи:</div>
-                  <div style="font-size:28px;font-weight:700;letter-spacing:4px;color:#065f46">${order.pickup_code}</div>
-                  <div style="font-size:12px;color:#065f46;margin-top:4px">Назовите этот код для получения заказа</div>
-                </div>
-                `;
-            }
-
-            html += `</div>`;
-        });
+        let html = `<h2>Мои заказы</h2><div id="orders-list">${data.orders.map(renderOrderCard).join('')}</div>`;
 
+        if (data.next_cursor) {
+            html += `<button class="btn btn-secondary" id="load-more" style="margin-top:8px">${t('loadMore')}</button>`;
+        }
         html += `<button class="btn" id="refresh-orders" style="margin-top:16px">${t('refresh')}</button>`;
 
         container.innerHTML = html;
 
         container.querySelector('#refresh-orders').addEventListener('click', () => renderMyOrders(container, navigateTo));
 
+        // Older pages: keyset cursor from the previous page
+        let cursor = data.next_cursor;
+        const loadMore = container.querySelector('#load-more');
+        if (loadMore) {
+            loadMore.addEventListener('click', async () => {
+                loadMore.disabled = true;
+                const page = await getMyOrders(cursor);
+                container.querySelector('#orders-list').insertAdjacentHTML('beforeend', page.orders.map(renderOrderCard).join(''));
+                cursor = page.next_cursor;
+                loadMore.disabled = false;
+                if (!cursor) loadMore.remove();
+            });
+        }
+
+        // Re-render when one of my orders changes status (PAID, READY, PICKED_UP),
+        // only while one is still on its way: each stream holds a server thread
+        if (data.orders.some(o => !FINISHED_STATUSES.includes(o.status))) {
+            subscribeOrderEvents(() => renderMyOrders(container, navigateTo));
+        } else {
+            unsubscribeOrderEvents();
+        }
+
     } catch (err) {
         container.innerHTML = `<h2>Мои заказы</h2><p class="error">${t('error')}: ${err.message || err.error}</p>`;
     }
 }
+
+function renderOrderCard(order) {
+    const items = order.items.map(i => `${i.name} x${i.qty}`).join(', ');
+    const statusClass = order.status === 'READY' ? 'success' : (order.status === 'PICKED_UP' ? 'info' : 'warning');
+
+    let html = `
+    <div class="order-card" style="margin-bottom:12px">
+      <div class="order-card-header">
+        <span class="order-card-id">#${order.id.slice(-8)}</span>
+        <span class="order-card-status" style="background:${order.status === 'READY' ? '#d1fae5' : '#fef3c7'};color:${order.status === 'READY' ? '#065f46' : '#92400e'}">${tStatus(order.status)}</span>
+      </div>
+      <div><strong>${t('items')}:</strong> ${items}</div>
+      <div><strong>${t('total')}:</strong> ${order.total} ₸</div>
+      <div style="font-size:13px;color:#666">${new Date(order.created_at).toLocaleString()}</div>
+    `;
+
+    // Show pickup code prominently when order is READY
+    if (order.status === 'READY' && order.pickup_code) {
+        html += `
+        <div style="margin-top:10px;padding:12px;background:#d1fae5;border:2px solid #065f46;border-radius:8px;text-align:center">
+          <div style="font-size:13px;color:#065f46;margin-bottom:4px">Код выдачи:</div>
+          <div style="font-size:28px;font-weight:700;letter-spacing:4px;color:#065f46">${order.pickup_code}</div>
+          <div style="font-size:12px;color:#065f46;margin-top:4px">Назовите этот код для получения заказа</div>
+        </div>
+        `;
+    }
+
+    html += `</div>`;
+    return html;
+}